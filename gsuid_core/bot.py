@@ -1,33 +1,114 @@
 import random
 import asyncio
-from typing import List, Union, Literal, Optional
+from typing import Set, List, Tuple, Union, Literal, Optional, Coroutine
 
 from fastapi import WebSocket
-from msgspec import json as msgjson
 
 from gsuid_core.logger import logger
+from gsuid_core.pool import HandlerPool
+from gsuid_core.config import core_config
 from gsuid_core.gs_logger import GsLogger
+from gsuid_core.writer import FrameWriter
 from gsuid_core.segment import MessageSegment
+from gsuid_core.trace import Span, traced, tracer
 from gsuid_core.utils.image.convert import text2pic
-from gsuid_core.models import Event, Message, MessageSend
+from gsuid_core.protocol import PROTOCOL, get_decoder
+from gsuid_core.models import Event, Message, MessageSend, MessageReceive
 from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
 
-R_enabled = core_plugins_config.get_config('AutoAddRandomText').data
-R_text = core_plugins_config.get_config('RandomText').data
-is_text2pic = core_plugins_config.get_config('AutoTextToPic').data
-text2pic_limit = core_plugins_config.get_config('TextToPicThreshold').data
-is_specific_msg_id = core_plugins_config.get_config('EnableSpecificMsgId').data
-specific_msg_id = core_plugins_config.get_config('SpecificMsgId').data
+R_enabled = core_plugins_config.handle('AutoAddRandomText')
+R_text = core_plugins_config.handle('RandomText')
+is_text2pic = core_plugins_config.handle('AutoTextToPic')
+text2pic_limit = core_plugins_config.handle('TextToPicThreshold')
+is_specific_msg_id = core_plugins_config.handle('EnableSpecificMsgId')
+specific_msg_id = core_plugins_config.handle('SpecificMsgId')
+
+ingest_config = core_config.get_config('ingest')
+INGEST_SIZE: int = ingest_config.get('queue_size', 200)
+INGEST_WORKERS: int = ingest_config.get('workers', 4)
+INGEST_OVERFLOW: str = ingest_config.get('overflow', 'block')
+
+
+def _finish_dropped(span: Optional[Span], status: str):
+    '''未被处理的消息同样结束其trace, 以便在trace中看到被丢弃的消息'''
+    if span is not None:
+        span.attrs['status'] = status
+        tracer.finish(span)
 
 
 class _Bot:
-    def __init__(self, _id: str, ws: WebSocket):
+    def __init__(
+        self,
+        _id: str,
+        ws: WebSocket,
+        is_batch: bool = False,
+        protocol: PROTOCOL = 'json',
+        is_chunk: bool = False,
+    ):
         self.bot_id = _id
         self.bot = ws
-        self.logger = GsLogger(self.bot_id, ws)
-        self.queue = asyncio.queues.Queue()
+        self.protocol: PROTOCOL = protocol
+        self.decode = get_decoder(protocol)
+        # 所有发往适配器的帧都通过writer写出
+        self.writer = FrameWriter(ws, is_batch, protocol, is_chunk)
+        self.logger = GsLogger(self.bot_id, self.writer)
+        self.queue = HandlerPool()
         self.bg_tasks = set()
-
+        # 接收与分发之间的缓冲队列, 由websocket_endpoint中的分发协程消费
+        # 与消息一同传递的是其所属trace的根span
+        self.ingest: 'asyncio.Queue[Tuple[MessageReceive, Optional[Span]]]'
+        self.ingest = asyncio.Queue(INGEST_SIZE)
+        self.ingest_dropped = 0
+        self.frames_in = 0
+        self.bytes_in = 0
+        # 该连接的常驻协程(执行池调度/消息分发/发送), 断开时统一回收
+        self.workers: Set[asyncio.Task] = set()
+        self.is_closed = False
+
+    def add_worker(self, coro: Coroutine) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self.workers.add(task)
+        task.add_done_callback(self.workers.discard)
+        return task
+
+    async def close(self):
+        if self.is_closed:
+            return
+        self.is_closed = True
+        self.writer.close()
+
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
+        while not self.ingest.empty():
+            _, span = self.ingest.get_nowait()
+            self.ingest.task_done()
+            _finish_dropped(span, 'dropped')
+
+        await self.queue.shutdown()
+        logger.info(f'[{self.bot_id}] 连接资源已回收')
+
+    async def put_event(
+        self, msg: MessageReceive, span: Optional[Span] = None
+    ):
+        if not self.ingest.full() or INGEST_OVERFLOW == 'block':
+            await self.ingest.put((msg, span))
+            return
+
+        self.ingest_dropped += 1
+        if INGEST_OVERFLOW == 'drop_oldest':
+            _, oldest = self.ingest.get_nowait()
+            self.ingest.task_done()
+            _finish_dropped(oldest, 'dropped')
+            self.ingest.put_nowait((msg, span))
+            logger.warning(f'[{self.bot_id}] 消息队列已满, 丢弃最早的消息...')
+        else:
+            _finish_dropped(span, 'rejected')
+            logger.warning(f'[{self.bot_id}] 消息队列已满, 拒绝该消息...')
+            await self.logger.warning(f'消息队列已满, 消息 {msg.msg_id} 已被拒绝处理')
+
+    @traced('target_send')
     async def target_send(
         self,
         message: Union[Message, List[Message], List[str], str, bytes],
@@ -57,25 +138,26 @@ class _Bot:
         if at_sender and sender_id:
             _message.append(MessageSegment.at(sender_id))
 
-        if R_enabled:
+        if R_enabled.value:
+            r_text = R_text.value
             result = ''.join(
-                random.choice(R_text)
-                for _ in range(random.randint(1, len(R_text)))
+                random.choice(r_text)
+                for _ in range(random.randint(1, len(r_text)))
             )
             _message.append(MessageSegment.text(result))
 
-        if is_text2pic:
+        if is_text2pic.value:
             if (
                 len(_message) == 1
                 and _message[0].type == 'text'
                 and isinstance(_message[0].data, str)
-                and len(_message[0].data) >= int(text2pic_limit)
+                and len(_message[0].data) >= int(text2pic_limit.value)
             ):
                 img = await text2pic(_message[0].data)
                 _message = [MessageSegment.image(img)]
 
-        if is_specific_msg_id and not msg_id:
-            msg_id = specific_msg_id
+        if is_specific_msg_id.value and not msg_id:
+            msg_id = specific_msg_id.value
 
         send = MessageSend(
             content=_message,
@@ -86,13 +168,10 @@ class _Bot:
             msg_id=msg_id,
         )
         logger.info(f'[发送消息to] {bot_id} - {target_type} - {target_id}')
-        await self.bot.send_bytes(msgjson.encode(send))
+        await self.writer.send(send)
 
     async def _process(self):
-        while True:
-            data = await self.queue.get()
-            asyncio.create_task(data)
-            self.queue.task_done()
+        await self.queue.process()
 
 
 class Bot:
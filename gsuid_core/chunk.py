@@ -0,0 +1,58 @@
+from uuid import uuid4
+from base64 import b64decode, b64encode
+from typing import List, Tuple, Union, Iterator, Optional
+
+from gsuid_core.config import core_config
+from gsuid_core.models import MessageChunk
+
+CHUNK_SIZE: int = core_config.get_config('ws').get('chunk_size', 524288)
+
+Payload = Union[bytes, str]
+
+
+def take_chunk(
+    data: Payload, chunks: Optional[List[Tuple[str, Payload]]]
+) -> Optional[str]:
+    '''
+    超过分片大小的数据登记到chunks中, 并返回消息内替代它的`chunk://`引用
+
+    data为bytes或base64字符串, 未开启分片或数据较小时返回`None`
+    '''
+    if chunks is None or len(data) <= CHUNK_SIZE:
+        return None
+    chunk_id = uuid4().hex
+    chunks.append((chunk_id, data))
+    return f'chunk://{chunk_id}'
+
+
+def iter_chunks(
+    chunk_id: str, data: Payload, is_binary: bool
+) -> Iterator[MessageChunk]:
+    '''
+    逐个生成分片帧, 每次只编码一个分片
+
+    msgpack协议下分片为原始bytes;
+    json协议下为base64文本, 按序拼接即为完整数据的base64
+    '''
+    if isinstance(data, str):
+        data = data[9:] if data.startswith('base64://') else data
+        if is_binary:
+            data = b64decode(data)
+
+    if isinstance(data, str):
+        # 按4的倍数切分base64文本, 保证每段都可以独立解码
+        step = CHUNK_SIZE - CHUNK_SIZE % 4
+    elif is_binary:
+        step = CHUNK_SIZE
+    else:
+        # 按3的倍数切分, 各段的base64拼接后与整体编码一致
+        step = CHUNK_SIZE - CHUNK_SIZE % 3
+
+    total = (len(data) + step - 1) // step
+    for seq in range(total):
+        start = seq * step
+        end = start + step
+        part = data[start:end]
+        if isinstance(part, bytes) and not is_binary:
+            part = b64encode(part).decode()
+        yield MessageChunk(id=chunk_id, seq=seq, total=total, data=part)
@@ -1,5 +1,5 @@
 import asyncio
-from typing import Union
+from typing import Dict, List, Union
 
 import websockets.client
 from msgspec import json as msgjson
@@ -13,19 +13,46 @@ class GsClient:
         cls, IP: str = 'localhost', PORT: Union[str, int] = '8765'
     ):
         self = GsClient()
-        cls.ws_url = f'ws://{IP}:{PORT}/ws/Nonebot'
+        # 开启分片后, 超大的消息不再需要提高max_size
+        cls.ws_url = f'ws://{IP}:{PORT}/ws/Nonebot?chunk=true'
         print(f'连接至WS链接{self.ws_url}...')
-        cls.ws = await websockets.client.connect(cls.ws_url, max_size=2**25)
+        cls.ws = await websockets.client.connect(cls.ws_url)
+        cls.chunks: Dict[str, List[str]] = {}
         print('已成功链接！')
         return self
 
     async def recv_msg(self):
         try:
             async for message in self.ws:
-                print(msgjson.decode(message, type=MessageSend))
+                data = msgjson.decode(message)
+                if data.get('type') == 'chunk':
+                    self.chunks.setdefault(data['id'], []).append(data['data'])
+                    continue
+                msg = msgjson.decode(message, type=MessageSend)
+                if msg.content:
+                    self.restore(msg.content)
+                print(msg)
         except ConnectionClosedError:
             print('断开链接...')
 
+    def restore(self, content: List[Message]):
+        '''将`chunk://`引用替换为拼接后的完整数据'''
+        for msg in content:
+            if msg.type == 'node' and isinstance(msg.data, list):
+                # data的类型为Any, 其中的消息被解码为dict
+                msg.data = [
+                    Message(**item) if isinstance(item, dict) else item
+                    for item in msg.data
+                ]
+                self.restore(msg.data)
+            elif isinstance(msg.data, str) and 'chunk://' in msg.data:
+                head, chunk_id = msg.data.split('chunk://', 1)
+                data = ''.join(self.chunks.pop(chunk_id, []))
+                if msg.type == 'file':
+                    msg.data = f'{head}{data}'
+                else:
+                    msg.data = f'base64://{data}'
+
     async def _input(self):
         return await asyncio.get_event_loop().run_in_executor(
             None, lambda: input("请输入消息\n")
@@ -70,4 +97,5 @@ async def main():
     await client.start()
 
 
-asyncio.run(main())
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,6 +1,19 @@
 import json
 from pathlib import Path
-from typing import Dict, List, Union, Literal, overload
+from typing import (
+    Any,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Generic,
+    Literal,
+    TypeVar,
+    Callable,
+    overload,
+)
+
+from gsuid_core.persist import atomic_write, write_behind
 
 CONFIG_PATH = Path(__file__).parent / 'config.json'
 
@@ -12,28 +25,178 @@ CONFIG_DEFAULT = {
     'misfire_grace_time': 90,
     'log': {
         'level': 'INFO',
-        # ...
+        # 日志文件格式: text, 或json(每行一个JSON对象)
+        'format': 'text',
+        # 超过该长度的字符串只记录长度与哈希, 避免写入base64图片
+        'payload_limit': 100,
+        # 按类别采样, 每秒前burst条全部记录, 超出后只记录rate比例
+        'sample': {
+            'event': {'rate': 0.01, 'burst': 20},
+            'trigger': {'rate': 0.1, 'burst': 20},
+            'command': {'rate': 0.1, 'burst': 20},
+        },
     },
     'command_start': [],
     'sv': {},
+    'pool': {
+        'max_tasks': 32,
+        'max_user_tasks': 2,
+        'max_group_tasks': 8,
+        'max_user_queue': 10,
+        'shutdown_timeout': 10,
+    },
+    'ingest': {
+        'queue_size': 200,
+        'workers': 4,
+        # block: 等待队列空出; drop_oldest: 丢弃最早的消息; reject: 丢弃新消息
+        'overflow': 'block',
+        # 大于0时, 超过该大小的文件会解码写入磁盘, 以ev.file_spool访问
+        # 此时ev.file为落盘路径而非base64, 需插件支持后再开启
+        'spool_size': 0,
+    },
+    'ws': {
+        'ping_interval': 20,
+        'ping_timeout': 20,
+        # 发送队列上限, 达到后发送方会等待
+        'send_queue_size': 100,
+        # 适配器开启合并后, 小于batch_frame_size的帧会在窗口期内合并
+        'batch_window': 0.005,
+        'batch_frame_size': 4096,
+        'batch_max_size': 65536,
+        # 适配器开启分片后, 超过该大小的图片/语音/文件会分片发送
+        'chunk_size': 524288,
+    },
+    'media': {
+        # 开启后较大的图片将通过HTTP提供, 消息中只携带link://链接
+        'enable': False,
+        'min_size': 32768,
+        # 超过该天数未被再次发送的图片将被删除
+        'max_age': 7,
+        # 媒体库的总大小上限, 超出时从最久未使用的图片开始删除
+        'max_size': 1073741824,
+        # 适配器访问core的地址, 留空则使用HOST与PORT
+        'base_url': '',
+    },
+    'trace': {
+        'enable': True,
+        # 内存中保留最近的trace数量
+        'buffer_size': 200,
+        # 是否将span写入logs/trace下按天分割的jsonl文件
+        'file': False,
+        # trace文件保留的天数
+        'file_retention': 7,
+    },
+    'database': {
+        # WAL模式下读写互不阻塞, 关闭后也不再使用只读连接池
+        'wal': True,
+        'synchronous': 'NORMAL',
+        'mmap_size': 268435456,
+        # 负数为KiB
+        'cache_size': -65536,
+        'busy_timeout': 5000,
+        'temp_store': 'MEMORY',
+        # 只读连接数, 写入始终只使用一个连接
+        'read_pool_size': 4,
+    },
+    'reload': {
+        # 监视配置文件, 被直接修改时重新载入, 无需重启
+        'enable': False,
+        # 不支持inotify时轮询的间隔(秒)
+        'interval': 2,
+    },
+    'monitor': {
+        'enable': True,
+        # 检测事件循环延迟的间隔(秒)
+        'interval': 0.1,
+        # 延迟超过该值(秒)视为阻塞, 记录阻塞处的调用栈
+        'threshold': 0.25,
+    },
+    'image': {
+        # 编码图片的线程数
+        'workers': 4,
+        # 未指定时的默认格式: JPEG, WEBP, PNG, PNG8(调色板PNG)
+        'format': 'PNG',
+        'quality': 85,
+        # 超过该字节数时尝试压缩, 0为不限制
+        'target_size': 0,
+    },
 }
 STR_CONFIG = Literal['HOST', 'PORT']
 INT_CONFIG = Literal['misfire_grace_time']
 LIST_CONFIG = Literal['superusers', 'masters', 'command_start']
-DICT_CONFIG = Literal['sv', 'log']
+DICT_CONFIG = Literal[
+    'sv',
+    'log',
+    'pool',
+    'ingest',
+    'ws',
+    'media',
+    'image',
+    'trace',
+    'monitor',
+    'reload',
+    'database',
+]
+
+
+T = TypeVar('T')
+
+
+class ConfigHandle(Generic[T]):
+    '''
+    配置项的引用, 读取`value`即为当前值
+
+    set_config时原地更新, 热路径上只有一次属性访问, 不必在导入时取快照;
+    `subscribe`注册的回调在值改变后调用, 用于重建依赖该配置的结构
+    '''
+
+    __slots__ = ('key', 'value', 'callbacks')
+
+    def __init__(self, key: str, value: T):
+        self.key = key
+        self.value = value
+        self.callbacks: List[Callable[[T], Any]] = []
+
+    def subscribe(self, callback: Callable[[T], Any]) -> Callable[[T], Any]:
+        '''可作为装饰器使用'''
+        self.callbacks.append(callback)
+        return callback
+
+    def unsubscribe(self, callback: Callable[[T], Any]):
+        if callback in self.callbacks:
+            self.callbacks.remove(callback)
+
+    def update(self, value: T):
+        self.value = value
+        for callback in list(self.callbacks):
+            try:
+                callback(value)
+            except Exception as e:
+                from gsuid_core.logger import logger
+
+                logger.exception(f'[配置] {self.key} 的订阅回调出错: {e}')
+
+    def refresh(self, value: T):
+        '''重新读取配置文件后调用, 仅在值改变时通知'''
+        if value != self.value:
+            self.update(value)
 
 
 class CoreConfig:
     def __init__(self) -> None:
+        self.handles: Dict[str, ConfigHandle] = {}
         if not CONFIG_PATH.exists():
-            with open(CONFIG_PATH, 'w', encoding='UTF-8') as file:
-                json.dump(CONFIG_DEFAULT, file, indent=4, ensure_ascii=False)
+            atomic_write(CONFIG_PATH, self._dump(CONFIG_DEFAULT))
 
         self.update_config()
 
+    @staticmethod
+    def _dump(config: Dict) -> bytes:
+        return json.dumps(config, indent=4, ensure_ascii=False).encode('UTF-8')
+
     def write_config(self):
-        with open(CONFIG_PATH, 'w', encoding='UTF-8') as file:
-            json.dump(self.config, file, indent=4, ensure_ascii=False)
+        '''由write_behind合并写入, 事件循环外调用时立即写入'''
+        write_behind.schedule(CONFIG_PATH, lambda: self._dump(self.config))
 
     def update_config(self):
         # 打开config.json
@@ -44,9 +207,40 @@ class CoreConfig:
             if key not in self.config:
                 self.config[key] = CONFIG_DEFAULT[key]
 
+        for key, handle in self.handles.items():
+            handle.refresh(self.config[key])
+
         # 重新写回
         self.write_config()
 
+    def reload(self, data: bytes) -> Tuple[List[str], List[str]]:
+        '''
+        应用配置文件中被修改的项, 返回已生效与需要重启的配置项
+
+        只有通过`handle`读取的配置项会立即生效, 其余的在导入时已被读取,
+        仍会更新到内存中, 避免之后写入配置文件时被覆盖
+        '''
+        config = json.loads(data)
+        changed = []
+        restart = []
+        for key in CONFIG_DEFAULT:
+            if key not in config or config[key] == self.config.get(key):
+                continue
+            value = config[key]
+            old = self.config.get(key)
+            if isinstance(old, dict) and isinstance(value, dict):
+                # 原地更新, 各模块持有的字典仍然有效
+                old.clear()
+                old.update(value)
+                value = old
+            self.config[key] = value
+            if key in self.handles:
+                self.handles[key].update(value)
+                changed.append(key)
+            else:
+                restart.append(key)
+        return changed, restart
+
     @overload
     def get_config(self, key: STR_CONFIG) -> str:
         ...
@@ -72,6 +266,28 @@ class CoreConfig:
         else:
             return {}
 
+    @overload
+    def handle(self, key: STR_CONFIG) -> ConfigHandle[str]:
+        ...
+
+    @overload
+    def handle(self, key: DICT_CONFIG) -> ConfigHandle[Dict]:
+        ...
+
+    @overload
+    def handle(self, key: LIST_CONFIG) -> ConfigHandle[List]:
+        ...
+
+    @overload
+    def handle(self, key: INT_CONFIG) -> ConfigHandle[int]:
+        ...
+
+    def handle(self, key: str) -> ConfigHandle:
+        '''取得配置项的引用, 同一配置项共用一个'''
+        if key not in self.handles:
+            self.handles[key] = ConfigHandle(key, self.get_config(key))
+        return self.handles[key]
+
     @overload
     def set_config(self, key: STR_CONFIG, value: str) -> bool:
         ...
@@ -88,6 +304,8 @@ class CoreConfig:
         if key in CONFIG_DEFAULT:
             # 设置值
             self.config[key] = value
+            if key in self.handles:
+                self.handles[key].update(value)
             # 重新写回
             self.write_config()
             return True
@@ -0,0 +1,193 @@
+import os
+import sys
+import ctypes
+import struct
+import asyncio
+import ctypes.util
+from pathlib import Path
+from typing import Set, Dict, List, Tuple, Callable, Optional
+
+from gsuid_core.logger import logger
+from gsuid_core.persist import digest, write_behind
+from gsuid_core.config import CONFIG_PATH, core_config
+from gsuid_core.utils.plugins_config.gs_config import all_config_list
+
+reload_config = core_config.get_config('reload')
+RELOAD_ENABLE: bool = reload_config.get('enable', False)
+RELOAD_INTERVAL: float = reload_config.get('interval', 2)
+# 编辑器保存时可能连续写入多次, 等待该时间(秒)后再读取
+DEBOUNCE = 0.2
+
+# 接收文件内容, 返回已生效与需要重启才能生效的配置项
+Reload = Callable[[bytes], Tuple[List[str], List[str]]]
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class Inotify:
+    '''通过ctypes调用libc的inotify, 监视目录中写入完成与被替换的文件'''
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True
+        )
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1失败')
+        self.dirs: Dict[int, Path] = {}
+
+    def add(self, directory: Path):
+        wd = self.libc.inotify_add_watch(
+            self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO
+        )
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'无法监视{directory}')
+        self.dirs[wd] = directory
+
+    def read(self) -> Set[Path]:
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return set()
+
+        paths = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            start = offset + EVENT_HEADER.size
+            end = start + length
+            name = data[start:end].rstrip(b'\0')
+            offset = end
+            if wd in self.dirs and name:
+                paths.add(self.dirs[wd] / os.fsdecode(name))
+        return paths
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher:
+    '''
+    监视配置文件, 被直接修改时只应用发生变化的配置项
+
+    Linux下使用inotify, 其他平台或inotify不可用时按修改时间轮询;
+    内容与自身最近一次写入相同的修改会被忽略, 解析失败时保留当前配置
+    '''
+
+    def __init__(self, interval: float = RELOAD_INTERVAL):
+        self.interval = interval
+        self.files: Dict[Path, Reload] = {}
+        self.digests: Dict[Path, bytes] = {}
+        self.stats: Dict[Path, Tuple[int, int]] = {}
+        self.pending: Set[Path] = set()
+        self.inotify: Optional[Inotify] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def watch(self, path: Path, reload: Reload):
+        '''reload接收文件内容, 返回已生效与需要重启才能生效的配置项'''
+        self.files[path] = reload
+        try:
+            self.digests[path] = digest(path.read_bytes())
+            self.stats[path] = self._stat(path)
+        except OSError:
+            pass
+
+    def start(self):
+        if not RELOAD_ENABLE or self.loop is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.watch(CONFIG_PATH, core_config.reload)
+        for config in all_config_list.values():
+            self.watch(config.CONFIG_PATH, config.reload)
+
+        if sys.platform.startswith('linux'):
+            try:
+                self.inotify = Inotify()
+                for directory in {path.parent for path in self.files}:
+                    self.inotify.add(directory)
+                self.loop.add_reader(self.inotify.fd, self._on_inotify)
+            except (OSError, AttributeError) as e:
+                logger.warning(f'[配置] inotify不可用, 改为轮询: {e}')
+                if self.inotify is not None:
+                    self.inotify.close()
+                self.inotify = None
+
+        if self.inotify is None:
+            self._task = asyncio.create_task(self._poll())
+        logger.info(f'[配置] 正在监视 {len(self.files)} 个配置文件的修改')
+
+    def stop(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self.inotify is not None and self.loop is not None:
+            self.loop.remove_reader(self.inotify.fd)
+            self.inotify.close()
+            self.inotify = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self.loop = None
+
+    @staticmethod
+    def _stat(path: Path) -> Tuple[int, int]:
+        stat = path.stat()
+        return stat.st_mtime_ns, stat.st_size
+
+    def _on_inotify(self):
+        if self.inotify is None or self.loop is None:
+            return
+        for path in self.inotify.read():
+            if path in self.files:
+                self.pending.add(path)
+        if self.pending and self._handle is None:
+            self._handle = self.loop.call_later(DEBOUNCE, self._apply_pending)
+
+    def _apply_pending(self):
+        self._handle = None
+        pending, self.pending = self.pending, set()
+        for path in pending:
+            self.check(path)
+
+    async def _poll(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            for path in list(self.files):
+                try:
+                    stat = self._stat(path)
+                except OSError:
+                    continue
+                if stat != self.stats.get(path):
+                    self.stats[path] = stat
+                    self.check(path)
+
+    def check(self, path: Path):
+        try:
+            data = path.read_bytes()
+        except OSError:
+            return
+        file_digest = digest(data)
+        if file_digest in (
+            self.digests.get(path),
+            write_behind.digests.get(path),
+        ):
+            self.digests[path] = file_digest
+            return
+        self.digests[path] = file_digest
+
+        try:
+            changed, restart = self.files[path](data)
+        except Exception as e:
+            logger.warning(f'[配置] {path.name} 解析失败, 已忽略本次修改: {e}')
+            return
+        if changed:
+            logger.info(f'[配置] 已从 {path.name} 重新载入: {", ".join(changed)}')
+        if restart:
+            logger.warning(f'[配置] {path.name} 中的 {", ".join(restart)} 需要重启后生效')
+
+
+config_watcher = ConfigWatcher()
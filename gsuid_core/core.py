@@ -1,25 +1,44 @@
+import re
 import sys
-import asyncio
-from typing import Dict
+import time
 from pathlib import Path
+from urllib.parse import quote
+from typing import Dict, Optional
 
 import uvicorn
-from msgspec import json as msgjson
 from starlette.requests import Request
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, FileResponse, PlainTextResponse
+from fastapi import FastAPI, WebSocket, HTTPException, WebSocketDisconnect
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 from gsuid_core.sv import SL  # noqa: E402
 from gsuid_core.gss import gss  # noqa: E402
-from gsuid_core.logger import logger  # noqa: E402
+from gsuid_core.trace import tracer  # noqa: E402
+from gsuid_core.profiler import profiler  # noqa: E402
+from gsuid_core.spool import clean_spool  # noqa: E402
+from gsuid_core.bot import INGEST_WORKERS  # noqa: E402
 from gsuid_core.config import core_config  # noqa: E402
 from gsuid_core.handler import handle_event  # noqa: E402
-from gsuid_core.models import MessageReceive  # noqa: E402
+from gsuid_core.persist import write_behind  # noqa: E402
+from gsuid_core.protocol import PROTOCOL_LIST  # noqa: E402
+from gsuid_core.loop_monitor import loop_monitor  # noqa: E402
 from gsuid_core.webconsole.mount_app import site  # noqa: E402
+from gsuid_core.logger import logger, get_log_stats  # noqa: E402
+from gsuid_core.config_watcher import config_watcher  # noqa: E402
+from gsuid_core.metrics import DISPATCH_SECONDS, registry  # noqa: E402
+from gsuid_core.utils.database.migrations import migrate  # noqa: E402
 from gsuid_core.aps import start_scheduler, shutdown_scheduler  # noqa: E402
+from gsuid_core.utils.database.base_models import (  # noqa: E402
+    dispose_engines,
+)
 from gsuid_core.utils.plugins_config.models import (  # noqa: E402
     GsListStrConfig,
 )
+from gsuid_core.media_store import (  # noqa: E402
+    MEDIA_TYPE,
+    MEDIA_ROUTE,
+    media_store,
+)
 from gsuid_core.utils.plugins_config.gs_config import (  # noqa: E402
     all_config_list,
 )
@@ -35,29 +54,104 @@ from gsuid_core.utils.plugins_update._plugins import (  # noqa: E402
 app = FastAPI()
 HOST = core_config.get_config('HOST')
 PORT = int(core_config.get_config('PORT'))
+ws_config = core_config.get_config('ws')
+MEDIA_NAME = re.compile(r'[0-9a-f]{64}\.(png|jpg|gif|webp|bin)')
 
 
 @app.websocket('/ws/{bot_id}')
-async def websocket_endpoint(websocket: WebSocket, bot_id: str):
-    bot = await gss.connect(websocket, bot_id)
+async def websocket_endpoint(
+    websocket: WebSocket,
+    bot_id: str,
+    batch: bool = False,
+    protocol: str = 'json',
+    chunk: bool = False,
+):
+    if protocol not in PROTOCOL_LIST:
+        logger.warning(f'{bot_id}请求了未知的协议{protocol}, 使用json...')
+        protocol = 'json'
+    bot = await gss.connect(
+        websocket, bot_id, batch, protocol, chunk  # type: ignore
+    )
 
-    async def start():
-        try:
-            while True:
-                data = await websocket.receive_bytes()
-                msg = msgjson.decode(data, type=MessageReceive)
-                await handle_event(bot, msg)
-        except WebSocketDisconnect:
-            gss.disconnect(bot_id)
+    async def dispatch():
+        while True:
+            msg, span = await bot.ingest.get()
+            start = time.perf_counter()
+            try:
+                with tracer.use(span), tracer.span('handle_event'):
+                    await handle_event(bot, msg)
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                DISPATCH_SECONDS.observe(time.perf_counter() - start)
+                if span is not None:
+                    tracer.finish(span)
+                bot.ingest.task_done()
+
+    bot.add_worker(bot.writer.run())
+    bot.add_worker(bot._process())
+    for _ in range(INGEST_WORKERS):
+        bot.add_worker(dispatch())
+
+    try:
+        while True:
+            data = await websocket.receive_bytes()
+            span = tracer.start_trace('receive', bot_id=bot_id)
+            bot.frames_in += 1
+            bot.bytes_in += len(data)
+            msg = bot.decode(data)
+            if span is not None:
+                span.attrs.update(user_id=msg.user_id, group_id=msg.group_id)
+            await bot.put_event(msg, span)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        gss.disconnect(bot_id, bot)
+        await bot.close()
 
-    async def process():
-        await bot._process()
 
-    await asyncio.gather(process(), start())
+@app.get('/metrics')
+async def get_metrics():
+    return Response(registry.render(), media_type='text/plain; version=0.0.4')
+
+
+def etag_match(header: Optional[str], etag: str) -> bool:
+    '''If-None-Match可以是以逗号分隔的多个标签或`*`, 比较时忽略弱标签前缀'''
+    if not header:
+        return False
+    for tag in header.split(','):
+        tag = tag.strip()
+        if tag.startswith('W/'):
+            tag = tag[2:]
+        if tag == '*' or tag == etag:
+            return True
+    return False
+
+
+@app.get(f'{MEDIA_ROUTE}/{{name}}')
+async def get_media(request: Request, name: str):
+    if not MEDIA_NAME.fullmatch(name):
+        raise HTTPException(status_code=404)
+    path = media_store.get_path(name)
+    if not path.exists():
+        raise HTTPException(status_code=404)
+
+    # 文件名即内容哈希, 可以作为强ETag并永久缓存
+    headers = {
+        'ETag': f'"{name.split(".")[0]}"',
+        'Cache-Control': 'public, max-age=31536000, immutable',
+    }
+    if etag_match(request.headers.get('if-none-match'), headers['ETag']):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(
+        path, media_type=MEDIA_TYPE[path.suffix[1:]], headers=headers
+    )
 
 
 @app.on_event('startup')
 async def startup_event():
+    await migrate()
+    clean_spool()
     try:
         from gsuid_core.webconsole.__init__ import start_check
 
@@ -65,11 +159,17 @@ async def startup_event():
     except ImportError:
         logger.warning('未加载GenshinUID...网页控制台启动失败...')
     await start_scheduler()
+    loop_monitor.start()
+    config_watcher.start()
 
 
 @app.on_event('shutdown')
 async def shutdown_event():
     await shutdown_scheduler()
+    await loop_monitor.stop()
+    config_watcher.stop()
+    await write_behind.aflush()
+    await dispose_engines()
 
 
 def main():
@@ -104,6 +204,74 @@ def main():
                 value = data[name]
             all_config_list[config_name].set_config(name, value)
 
+    @app.get('/genshinuid/api/getBotStatus')
+    @site.auth.requires('admin')
+    async def _get_bot_status(request: Request):
+        return {'status': 0, 'msg': '', 'data': gss.get_bot_status()}
+
+    @app.get('/genshinuid/api/getLogStatus')
+    @site.auth.requires('admin')
+    async def _get_log_status(request: Request):
+        return {'status': 0, 'msg': '', 'data': get_log_stats()}
+
+    @app.get('/genshinuid/api/getSlowTraces')
+    @site.auth.requires('admin')
+    async def _get_slow_traces(request: Request):
+        return {
+            'status': 0,
+            'msg': '',
+            'data': {'items': tracer.slowest()},
+        }
+
+    @app.get('/genshinuid/api/getLoopStatus')
+    @site.auth.requires('admin')
+    async def _get_loop_status(request: Request):
+        return {'status': 0, 'msg': '', 'data': loop_monitor.stats()}
+
+    @app.get('/genshinuid/api/getProfileStatus')
+    @site.auth.requires('admin')
+    async def _get_profile_status(request: Request):
+        data = profiler.status()
+        data['options'] = [{'label': name, 'value': name} for name in SL.lst]
+        return {'status': 0, 'msg': '', 'data': data}
+
+    @app.post('/genshinuid/api/startProfile')
+    @site.auth.requires('admin')
+    async def _start_profile(request: Request, data: Dict):
+        sv_name = data.get('sv') or ''
+        trigger = data.get('trigger') or ''
+        if sv_name not in SL.lst:
+            return {'status': 1, 'msg': f'未找到服务 {sv_name}', 'data': {}}
+        if trigger and trigger not in SL.lst[sv_name].TL:
+            return {'status': 1, 'msg': f'未找到触发器 {trigger}', 'data': {}}
+        try:
+            profiler.start(sv_name, trigger, float(data.get('seconds') or 30))
+        except ValueError as e:
+            return {'status': 1, 'msg': str(e), 'data': {}}
+        return {'status': 0, 'msg': '开始采样', 'data': profiler.status()}
+
+    @app.post('/genshinuid/api/stopProfile')
+    @site.auth.requires('admin')
+    async def _stop_profile(request: Request):
+        profiler.stop()
+        return {'status': 0, 'msg': '已停止采样', 'data': profiler.status()}
+
+    @app.get('/genshinuid/api/downloadProfile')
+    @site.auth.requires('admin')
+    async def _download_profile(request: Request, kind: str = 'wall'):
+        session = profiler.session
+        if session is None:
+            raise HTTPException(status_code=404)
+        name = f'{session.sv}_{kind}.collapsed'
+        return PlainTextResponse(
+            session.collapsed(kind),
+            headers={
+                'Content-Disposition': (
+                    f"attachment; filename*=UTF-8''{quote(name)}"
+                )
+            },
+        )
+
     @app.get('/genshinuid/api/getPlugins')
     @site.auth.requires('admin')
     async def _get_plugins(request: Request):
@@ -151,6 +319,9 @@ def main():
         app,
         host=HOST,
         port=PORT,
+        # 通过ping/pong检测半开连接, 超时后连接会被关闭并回收
+        ws_ping_interval=ws_config.get('ping_interval', 20),
+        ws_ping_timeout=ws_config.get('ping_timeout', 20),
         log_config={
             'version': 1,
             'disable_existing_loggers': False,
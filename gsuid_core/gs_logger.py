@@ -1,16 +1,14 @@
 from typing import Literal
 
-from fastapi import WebSocket
-from msgspec import json as msgjson
-
 from gsuid_core.models import MessageSend
+from gsuid_core.writer import FrameWriter
 from gsuid_core.segment import MessageSegment
 
 
 class GsLogger:
-    def __init__(self, bot_id: str, ws: WebSocket):
+    def __init__(self, bot_id: str, writer: FrameWriter):
         self.bot_id = bot_id
-        self.bot = ws
+        self.bot = writer
 
     def get_msg_send(
         self, type: Literal['INFO', 'WARNING', 'ERROR', 'SUCCESS'], msg: str
@@ -23,21 +21,13 @@ class GsLogger:
         )
 
     async def info(self, msg: str):
-        await self.bot.send_bytes(
-            msgjson.encode(self.get_msg_send('INFO', msg))
-        )
+        await self.bot.send(self.get_msg_send('INFO', msg))
 
     async def warning(self, msg: str):
-        await self.bot.send_bytes(
-            msgjson.encode(self.get_msg_send('WARNING', msg))
-        )
+        await self.bot.send(self.get_msg_send('WARNING', msg))
 
     async def error(self, msg: str):
-        await self.bot.send_bytes(
-            msgjson.encode(self.get_msg_send('ERROR', msg))
-        )
+        await self.bot.send(self.get_msg_send('ERROR', msg))
 
     async def success(self, msg: str):
-        await self.bot.send_bytes(
-            msgjson.encode(self.get_msg_send('SUCCESS', msg))
-        )
+        await self.bot.send(self.get_msg_send('SUCCESS', msg))
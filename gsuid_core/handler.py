@@ -1,23 +1,25 @@
-import asyncio
-from copy import deepcopy
-from typing import Dict, List
+from copy import copy
+from base64 import b64encode
+from typing import List, Optional
 
 from gsuid_core.sv import SL
 from gsuid_core.bot import Bot, _Bot
 from gsuid_core.logger import logger
-from gsuid_core.trigger import Trigger
 from gsuid_core.config import core_config
+from gsuid_core.trace import tracer, current_span
+from gsuid_core.spool import SpoolFile, need_spool
+from gsuid_core.trigger_index import trigger_index
 from gsuid_core.models import Event, Message, MessageReceive
 
-command_start = core_config.get_config('command_start')
-config_masters = core_config.get_config('masters')
-config_superusers = core_config.get_config('superusers')
+command_start = core_config.handle('command_start')
+config_masters = core_config.handle('masters')
+config_superusers = core_config.handle('superusers')
 
 
 async def get_user_pml(msg: MessageReceive) -> int:
-    if msg.user_id in config_masters:
+    if msg.user_id in config_masters.value:
         return 0
-    elif msg.user_id in config_superusers:
+    elif msg.user_id in config_superusers.value:
         return 1
     else:
         return msg.user_pm if msg.user_pm >= 1 else 2
@@ -45,17 +47,34 @@ async def msg_process(msg: MessageReceive) -> Event:
                 event.at = _msg.data
                 event.at_list.append(_msg.data)
         elif _msg.type == 'image':
+            # msgpack协议下图片为原始bytes
+            if isinstance(_msg.data, bytes):
+                _msg.data = f'base64://{b64encode(_msg.data).decode()}'
             event.image = _msg.data
             event.image_list.append(_msg.data)
         elif _msg.type == 'reply':
             event.reply = _msg.data
         elif _msg.type == 'file' and _msg.data:
-            data = _msg.data.split('|')
-            event.file_name = data[0]
-            event.file = data[1]
-            if str(event.file).startswith(('http', 'https')):
+            if isinstance(_msg.data, str):
+                file_name, file = _msg.data.split('|', 1)
+            else:
+                # msgpack协议下文件为[文件名, bytes]
+                file_name, file = _msg.data
+            event.file_name = file_name
+            if isinstance(file, str) and file.startswith(('http', 'https')):
+                event.file = file
                 event.file_type = 'url'
+            elif need_spool(file):
+                # 较大的文件解码一次写入磁盘, 消息中只保留路径
+                spool = await SpoolFile.create(file_name, file)
+                event.file_spool = spool
+                event.file = str(spool.path)
+                event.file_type = 'spool'
+                _msg = Message(type='file', data=f'{file_name}|{event.file}')
             else:
+                if isinstance(file, bytes):
+                    file = b64encode(file).decode()
+                event.file = file
                 event.file_type = 'base64'
         _content.append(_msg)
     event.content = _content
@@ -68,68 +87,65 @@ async def handle_event(ws: _Bot, msg: MessageReceive):
     event = await msg_process(msg)
     logger.info('[收到事件]', event=event)
 
-    if command_start and event.raw_text:
-        for start in command_start:
+    spool: Optional[SpoolFile] = event.file_spool
+    try:
+        await _dispatch(ws, msg, event, user_pm, spool)
+    finally:
+        # 各触发器持有各自的引用, 全部执行完毕后删除落盘文件
+        if spool is not None:
+            spool.release()
+
+
+async def _dispatch(
+    ws: _Bot,
+    msg: MessageReceive,
+    event: Event,
+    user_pm: int,
+    spool: Optional[SpoolFile],
+):
+    if command_start.value and event.raw_text:
+        for start in command_start.value:
             if event.raw_text.strip().startswith(start):
                 event.raw_text = event.raw_text.replace(start, '')
                 break
         else:
             return
 
-    valid_event: Dict[Trigger, int] = {}
-    pending = [
-        _check_command(
-            SL.lst[sv].TL[tr],
-            SL.lst[sv].priority,
-            event,
-            valid_event,
-        )
-        for sv in SL.lst
-        for tr in SL.lst[sv].TL
-        if (
-            SL.lst[sv].enabled
-            and user_pm <= SL.lst[sv].pm
-            and msg.group_id not in SL.lst[sv].black_list
-            and msg.user_id not in SL.lst[sv].black_list
-            and (
-                True
-                if SL.lst[sv].area == 'ALL'
-                or (msg.group_id and SL.lst[sv].area == 'GROUP')
-                or (not msg.group_id and SL.lst[sv].area == 'DIRECT')
-                else False
-            )
-            and (
-                True
-                if (not SL.lst[sv].white_list or SL.lst[sv].white_list == [''])
-                else (
-                    msg.user_id in SL.lst[sv].white_list
-                    or msg.group_id in SL.lst[sv].white_list
-                )
-            )
-        )
-    ]
-    await asyncio.gather(*pending, return_exceptions=True)
-    if len(valid_event) >= 1:
-        sorted_event = sorted(valid_event.items(), key=lambda x: x[1])
-        for trigger, _ in sorted_event:
-            _event = deepcopy(event)
-            message = await trigger.get_command(_event)
+    available = SL.get_available(msg.group_id, msg.user_id, user_pm)
+    for sv, trigger, match in trigger_index.lookup(event):
+        if sv.name in available:
+            # 浅拷贝即可, 各触发器共享消息内容, 仅command/text等字段独立
+            _event = copy(event)
+            message = await trigger.get_command(_event, match)
             bot = Bot(ws, _event)
             logger.info(
                 '[命令触发]',
                 trigger=[_event.raw_text, trigger.type, trigger.keyword],
             )
             logger.info('[命令触发]', command=message)
-            ws.queue.put_nowait(trigger.func(bot, message))
+            trigger.hits.inc()
+            # 在创建协程之前检查, 丢弃时不会留下未执行的协程与落盘文件的引用
+            if ws.queue.is_full(msg.user_id, msg.group_id):
+                ws.queue.drop(msg.user_id)
+            else:
+                coro = trigger.func(bot, message)
+                if current_span.get() is not None:
+                    coro = tracer.wrap(
+                        coro,
+                        'trigger',
+                        sv=sv.name,
+                        trigger=f'{trigger.type}:{trigger.keyword}',
+                    )
+                if spool is not None:
+                    coro = spool.hold(coro)
+                ws.queue.put_nowait(
+                    coro,
+                    msg.user_id,
+                    msg.group_id,
+                    # 仅限管理员的服务可以越过普通任务优先执行
+                    0 if sv.pm <= 1 else sv.priority,
+                    trigger.cost,
+                    f'{sv.name}/{trigger.type}:{trigger.keyword}',
+                )
             if trigger.block:
                 break
-
-
-async def _check_command(
-    trigger: Trigger,
-    priority: int,
-    message: Event,
-    valid_event: Dict[Trigger, int],
-):
-    if trigger.check_command(message):
-        valid_event[trigger] = priority
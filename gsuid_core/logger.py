@@ -1,8 +1,13 @@
 import sys
+import json
+import time
+import atexit
+import random
 import logging
 import datetime
 import traceback
-from typing import TYPE_CHECKING
+from hashlib import blake2b
+from typing import TYPE_CHECKING, Any, Dict
 
 import loguru
 
@@ -36,83 +41,252 @@ class LoguruHandler(logging.Handler):  # pragma: no cover
         )
 
 
-def format_event(record):
-    if record['exception']:
-        return f'{traceback.print_tb(record["exception"].traceback)} \n'
+log_config = core_config.get_config('log')
+LEVEL: str = log_config.get('level', 'INFO')
+LOG_FORMAT: str = log_config.get('format', 'text')
+PAYLOAD_LIMIT: int = log_config.get('payload_limit', 100)
+SAMPLE_CONFIG: Dict[str, Dict] = log_config.get(
+    'sample',
+    {
+        'event': {'rate': 0.01, 'burst': 20},
+        'trigger': {'rate': 0.1, 'burst': 20},
+        'command': {'rate': 0.1, 'burst': 20},
+    },
+)
+
+RAW_FIELDS = (
+    'raw_text',
+    'image',
+    'at',
+    'image_list',
+    'at_list',
+    'is_tome',
+    'reply',
+    'file_name',
+    'file_type',
+    'file',
+)
+RECEIVE_FIELDS = (
+    'bot_id',
+    'bot_self_id',
+    'msg_id',
+    'user_type',
+    'group_id',
+    'user_id',
+    'user_pm',
+    'content',
+)
+
+
+class Sampler:
+    '''
+    按类别采样日志, 每秒前burst条全部记录, 超出后只记录rate比例
+
+    未配置的类别全部记录
+    '''
+
+    def __init__(self, rate: float = 1, burst: int = 0):
+        self.rate = rate
+        self.burst = burst
+        self.second = 0
+        self.count = 0
+        self.logged = 0
+        self.dropped = 0
+
+    def __call__(self) -> bool:
+        now = int(time.monotonic())
+        if now != self.second:
+            self.second = now
+            self.count = 0
+        self.count += 1
+
+        if self.count <= self.burst or random.random() < self.rate:
+            self.logged += 1
+            return True
+        self.dropped += 1
+        return False
+
+
+samplers: Dict[str, Sampler] = {
+    category: Sampler(**option) for category, option in SAMPLE_CONFIG.items()
+}
+
+
+class LogCost:
+    '''统计日志在调用方线程中的开销(采样/摘要/格式化)'''
+
+    def __init__(self):
+        self.records = 0
+        self.patch_cost = 0.0
+        self.format_cost = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'records': self.records,
+            'patch_cost': self.patch_cost,
+            'format_cost': self.format_cost,
+            'cost_avg': (self.patch_cost + self.format_cost) / self.records
+            if self.records
+            else 0,
+            'sample': {
+                category: {'logged': s.logged, 'dropped': s.dropped}
+                for category, s in samplers.items()
+            },
+        }
+
+
+log_cost = LogCost()
+
+
+def get_log_stats() -> Dict[str, Any]:
+    return log_cost.stats()
+
+
+def brief(value: Any) -> Any:
+    '''截断过长的字符串, 以长度与哈希代替base64等原始数据'''
+    if isinstance(value, bytes):
+        return f'[bytes len={len(value)} hash={_hash(value)}]'
+    elif isinstance(value, str) and len(value) > PAYLOAD_LIMIT:
+        return (
+            f'{value[:PAYLOAD_LIMIT]}...'
+            f'[len={len(value)} hash={_hash(value.encode())}]'
+        )
+    elif isinstance(value, Message):
+        return {'type': value.type, 'data': brief(value.data)}
+    elif isinstance(value, (list, tuple)):
+        return [brief(v) for v in value]
+    return value
 
-    if 'trigger' in record['extra']:
-        _tg = record['extra']['trigger']
+
+def _hash(data: bytes) -> str:
+    return blake2b(data, digest_size=6).hexdigest()
+
+
+def event_summary(event: Event) -> Dict[str, Any]:
+    return {
+        field: brief(getattr(event, field))
+        for field in RAW_FIELDS + RECEIVE_FIELDS
+    }
+
+
+def patch_record(record):
+    '''
+    在调用方线程中执行一次: 决定是否采样, 并将Event替换为摘要
+
+    之后的格式化与写入只接触普通的dict
+    '''
+    log_cost.records += 1
+    extra = record['extra']
+    for category in ('event', 'command', 'trigger'):
+        if category in extra:
+            break
+    else:
+        return
+
+    start = time.perf_counter()
+    sampler = samplers.get(category)
+    extra['_sampled'] = sampler() if sampler else True
+    if extra['_sampled']:
+        if category == 'event':
+            extra['event'] = event_summary(extra['event'])
+        elif category == 'command':
+            event: Event = extra['command']
+            extra['command'] = {'command': event.command, 'text': event.text}
+    log_cost.patch_cost += time.perf_counter() - start
+
+
+def sample_filter(record) -> bool:
+    return record['extra'].get('_sampled', True)
+
+
+def _get_message(record) -> str:
+    extra = record['extra']
+    if 'trigger' in extra:
+        _tg = extra['trigger']
         message = (
             f'<m><b>[Trigger]</b></m> 消息 「{_tg[0]}」 触发'
             f' 「{_tg[1]}」 类型触发器, 关键词:'
             f' 「{_tg[2]}」 '
         )
-        message = message.replace('{', '{{').replace('}', '}}')
-    elif record['extra']:
-        event: Event = (
-            record['extra']['event']
-            if 'event' in record['extra']
-            else record['extra']['command']
+    elif 'event' in extra:
+        ev = extra['event']
+        raw = ', '.join(f'{k}={ev[k]}' for k in RAW_FIELDS)
+        receive = ', '.join(f'{k}={ev[k]}' for k in RECEIVE_FIELDS)
+        message = (
+            f'<c><b>[Raw]</b></c> {raw}'
+            f' | <m><b>[Receive]</b></m> {receive}, '
+        )
+    elif 'command' in extra:
+        command = extra['command']
+        message = (
+            f'<m><b>[Command]</b></m> '
+            f'command={command["command"]}, '
+            f'text={command["text"]}'
         )
-        if event.file and event.file_type != 'url':
-            file = f'{event.file[:20]}...(base64)'
-            content = [Message('file', f'{event.file_name}|{file}')]
-        else:
-            file = event.file
-            content = event.content
-
-        if 'event' in record['extra']:
-            message = (
-                f'<c><b>[Raw]</b></c> '
-                f'raw_text={event.raw_text}, '
-                f'image={event.image}, '
-                f'at={event.at}, '
-                f'image_list={event.image}, '
-                f'at_list={event.at_list}, '
-                f'is_tome={event.is_tome}, '
-                f'reply={event.reply}, '
-                f'file_name={event.file_name}, '
-                f'file_type={event.file_type}, '
-                f'file={file}'
-                f' | <m><b>[Receive]</b></m> '
-                f'bot_id={event.bot_id}, '
-                f'bot_self_id={event.bot_self_id}, '
-                f'msg_id={event.msg_id}, '
-                f'user_type={event.user_type}, '
-                f'group_id={event.group_id}, '
-                f'user_id={event.user_id}, '
-                f'user_pm={event.user_pm}, '
-                f'content={content}, '
-            )
-        else:
-            message = (
-                f'<m><b>[Command]</b></m> '
-                f'command={event.command}, '
-                f'text={event.text}'
-            )
-        message = message.replace('{', '{{').replace('}', '}}')
     else:
-        message = '{message}'
+        return '{message}'
+    return message.replace('{', '{{').replace('}', '}}')
+
+
+def format_event(record):
+    if record['exception']:
+        return f'{traceback.print_tb(record["exception"].traceback)} \n'
 
+    start = time.perf_counter()
+    message = _get_message(record)
     def_name: str = record['name']
-    time = '<g>{time:MM-DD HH:mm:ss}</g>'
+    time_str = '<g>{time:MM-DD HH:mm:ss}</g>'
     level = '[<lvl>{level}</lvl>]'
     def_name = f'<c><u>{".".join(def_name.split(".")[-5:])}</u></c>'
-    return f'{time} {level} {def_name} | {message} \n'
+    log_cost.format_cost += time.perf_counter() - start
+    return f'{time_str} {level} {def_name} | {message} \n'
 
 
-LEVEL: str = core_config.get_config('log').get('level', 'INFO')
+def format_json(record):
+    '''每行一个JSON对象, 写入extra后由loguru原样输出'''
+    start = time.perf_counter()
+    extra = record['extra']
+    data = {
+        'time': record['time'].isoformat(),
+        'level': record['level'].name,
+        'name': record['name'],
+        'message': record['message'],
+    }
+    for key in ('event', 'command', 'trigger'):
+        if key in extra:
+            data[key] = extra[key]
+    if record['exception']:
+        data['exception'] = ''.join(
+            traceback.format_exception(*record['exception'])
+        )
+    extra['_json'] = json.dumps(data, ensure_ascii=False, default=str)
+    log_cost.format_cost += time.perf_counter() - start
+    return '{extra[_json]}\n'
+
 
 logger.remove()
+logger.configure(patcher=patch_record)
 logger_id = logger.add(
-    sys.stdout, level=LEVEL, diagnose=False, format=format_event
+    sys.stdout,
+    level=LEVEL,
+    diagnose=False,
+    format=format_event,
+    filter=sample_filter,
+    # 写入在后台线程中进行, 不阻塞事件循环
+    enqueue=True,
 )
 
 logger.add(
     sink=get_res_path() / 'logs/{time:YYYY-MM-DD}.log',
-    format=format_event,
+    format=format_json if LOG_FORMAT == 'json' else format_event,
+    filter=sample_filter,
     rotation=datetime.time(),
     level=LEVEL,
+    enqueue=True,
+    # 缓冲写入, 攒满后批量落盘
+    buffering=65536,
     # diagnose=False,
     # backtrace=False,
 )
+# 退出时等待后台线程写完剩余日志
+atexit.register(logger.remove)
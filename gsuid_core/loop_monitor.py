@@ -0,0 +1,173 @@
+import sys
+import time
+import asyncio
+import datetime
+import threading
+import traceback
+from pathlib import Path
+from functools import lru_cache
+from collections import Counter, deque
+from typing import Any, Dict, List, Deque, Tuple, Optional
+
+from gsuid_core.logger import logger
+from gsuid_core.config import core_config
+from gsuid_core.metrics import LOOP_BLOCKS, LOOP_LAG_SECONDS
+
+monitor_config = core_config.get_config('monitor')
+MONITOR_ENABLE: bool = monitor_config.get('enable', True)
+MONITOR_INTERVAL: float = monitor_config.get('interval', 0.1)
+BLOCK_THRESHOLD: float = monitor_config.get('threshold', 0.25)
+PLUGINS_PATH = Path(__file__).resolve().parent / 'plugins'
+# 保留的阻塞记录数与每条记录的栈深度
+RECORD_SIZE = 100
+STACK_LIMIT = 20
+
+# (采样时的心跳, 插件, 任务名, 调用栈)
+Sample = Tuple[float, str, str, str]
+
+
+@lru_cache(maxsize=4096)
+def get_plugin(filename: str) -> Optional[str]:
+    '''文件位于plugins目录下时返回所属插件名'''
+    try:
+        parts = Path(filename).resolve().relative_to(PLUGINS_PATH).parts
+    except ValueError:
+        return None
+    return Path(parts[0]).stem if parts else None
+
+
+class LoopMonitor:
+    '''
+    事件循环延迟监控
+
+    心跳协程按固定间隔休眠, 以实际唤醒的延迟作为事件循环的延迟;
+    看门狗线程发现心跳超过阈值未更新时, 对事件循环所在线程的调用栈采样,
+    并按栈中的插件目录与当前任务名(执行池中为`SV/触发器`)归因
+    '''
+
+    def __init__(
+        self,
+        interval: float = MONITOR_INTERVAL,
+        threshold: float = BLOCK_THRESHOLD,
+    ):
+        self.interval = interval
+        self.threshold = threshold
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread_id = 0
+        self.beat = 0.0
+        self.samples: List[Sample] = []
+        self.lock = threading.Lock()
+        self.records: Deque[Dict[str, Any]] = deque(maxlen=RECORD_SIZE)
+
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self.blocks = 0
+        self._task: Optional[asyncio.Task] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        if not MONITOR_ENABLE or self._task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        self.beat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.create_task(self._heartbeat())
+        threading.Thread(
+            target=self._watchdog, name='gs_loop_watchdog', daemon=True
+        ).start()
+        logger.info(f'[事件循环] 延迟监控已启动, 阻塞阈值 {self.threshold * 1000:.0f}ms')
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self):
+        while True:
+            start = time.perf_counter()
+            self.beat = start
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - start - self.interval, 0)
+            self.lag_last = lag
+            if lag > self.lag_max:
+                self.lag_max = lag
+            LOOP_LAG_SECONDS.observe(lag)
+
+            with self.lock:
+                samples, self.samples = self.samples, []
+            if lag >= self.threshold:
+                self._report(lag, [s for s in samples if s[0] == start])
+
+    def _watchdog(self):
+        step = min(self.interval, self.threshold) / 2
+        while not self._stop.wait(step):
+            beat = self.beat
+            if time.perf_counter() - beat > self.interval + self.threshold:
+                self._sample(beat)
+
+    def _sample(self, beat: float):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+
+        plugin = 'core'
+        f = frame
+        while f is not None:
+            name = get_plugin(f.f_code.co_filename)
+            if name is not None:
+                plugin = name
+                break
+            f = f.f_back
+
+        task = asyncio.current_task(self.loop)
+        task_name = task.get_name() if task is not None else ''
+        stack = ''.join(
+            traceback.format_list(traceback.extract_stack(frame, STACK_LIMIT))
+        )
+        del frame, f
+        with self.lock:
+            self.samples.append((beat, plugin, task_name, stack))
+
+    def _report(self, lag: float, samples: List[Sample]):
+        self.blocks += 1
+        if samples:
+            # 多次采样时取出现最多的调用栈
+            stack = Counter(s[3] for s in samples).most_common(1)[0][0]
+            _, plugin, task_name, _ = next(s for s in samples if s[3] == stack)
+        else:
+            # 阻塞结束得太快, 看门狗未来得及采样
+            plugin, task_name, stack = 'unknown', '', ''
+
+        LOOP_BLOCKS.labels(plugin).inc()
+        self.records.appendleft(
+            {
+                'time': datetime.datetime.now().strftime('%m-%d %H:%M:%S'),
+                'lag': round(lag * 1000, 1),
+                'plugin': plugin,
+                'task': task_name,
+                'samples': len(samples),
+                'stack': stack,
+            }
+        )
+        logger.warning(
+            f'[事件循环] 阻塞 {lag * 1000:.0f}ms, '
+            f'插件: {plugin}, 任务: {task_name or "无"}\n{stack}'
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'lag_last': round(self.lag_last * 1000, 1),
+            'lag_max': round(self.lag_max * 1000, 1),
+            'blocks': self.blocks,
+            'threshold': self.threshold * 1000,
+            'items': list(self.records),
+        }
+
+
+loop_monitor = LoopMonitor()
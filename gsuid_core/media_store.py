@@ -0,0 +1,153 @@
+import os
+import time
+import asyncio
+from hashlib import sha256
+from base64 import b64decode
+from typing import Dict, List, Union
+from concurrent.futures import ThreadPoolExecutor
+
+from gsuid_core.models import Message
+from gsuid_core.config import core_config
+from gsuid_core.data_store import get_res_path
+
+media_config = core_config.get_config('media')
+MEDIA_ENABLE: bool = media_config.get('enable', False)
+MEDIA_MIN_SIZE: int = media_config.get('min_size', 32768)
+MEDIA_MAX_AGE: float = media_config.get('max_age', 7) * 86400
+MEDIA_MAX_SIZE: int = media_config.get('max_size', 1073741824)
+MEDIA_BASE_URL: str = media_config.get('base_url', '') or (
+    f'http://{core_config.get_config("HOST")}:'
+    f'{core_config.get_config("PORT")}'
+)
+
+MEDIA_PATH = get_res_path('media')
+MEDIA_ROUTE = '/media'
+# 两次清理之间的最短间隔(秒)
+PRUNE_INTERVAL = 600
+# 同一文件刷新修改时间的最短间隔(秒)
+TOUCH_INTERVAL = 3600
+
+MEDIA_TYPE = {
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+    'bin': 'application/octet-stream',
+}
+
+
+def _get_ext(data: bytes) -> str:
+    if data.startswith(b'\x89PNG'):
+        return 'png'
+    elif data.startswith(b'\xff\xd8'):
+        return 'jpg'
+    elif data.startswith(b'GIF8'):
+        return 'gif'
+    elif data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'webp'
+    return 'bin'
+
+
+class MediaStore:
+    '''
+    以内容哈希为文件名的本地媒体库
+
+    同一张图片只会写入一次, 通过`/media/{文件名}`路由提供下载,
+    消息中只需携带`link://`链接, 适配器也可以据此缓存
+
+    解码/哈希/写入在单独的线程中执行; 超过`max_age`未被再次发送,
+    或总大小超过`max_size`时从最久未使用的文件开始删除
+    '''
+
+    def __init__(self):
+        # 已确认落盘的文件名与最近一次刷新修改时间的时刻, 避免重复访问磁盘
+        self.stored: Dict[str, float] = {}
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='gs_media')
+        self.last_prune = 0.0
+
+    def get_path(self, name: str):
+        return MEDIA_PATH / name
+
+    def put(self, data: bytes) -> str:
+        '''写入图片并返回文件名, 会阻塞, 应在`executor`中调用'''
+        name = f'{sha256(data).hexdigest()}.{_get_ext(data)}'
+        path = self.get_path(name)
+        now = time.monotonic()
+        touched = self.stored.get(name)
+        if touched is None or now - touched >= TOUCH_INTERVAL:
+            try:
+                # 刷新修改时间, 清理时按最近一次使用计算
+                os.utime(path)
+            except FileNotFoundError:
+                temp = path.with_suffix('.tmp')
+                temp.write_bytes(data)
+                temp.replace(path)
+            self.stored[name] = now
+
+        if now - self.last_prune >= PRUNE_INTERVAL:
+            self.last_prune = now
+            self.prune()
+        return name
+
+    def prune(self):
+        '''删除过期的文件, 再按修改时间从旧到新删除至总大小不超过上限'''
+        files = []
+        for path in MEDIA_PATH.iterdir():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+
+        total = sum(size for _, size, _ in files)
+        expire = time.time() - MEDIA_MAX_AGE
+        for mtime, size, path in files:
+            if mtime >= expire and total <= MEDIA_MAX_SIZE:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            self.stored.pop(path.name, None)
+
+    def need_link(self, data: Union[bytes, str]) -> bool:
+        '''未开启媒体库或图片过小时不替换为链接'''
+        if not MEDIA_ENABLE:
+            return False
+        if isinstance(data, str):
+            # base64的长度约为原始数据的4/3
+            return (
+                data.startswith('base64://')
+                and len(data) * 3 // 4 >= MEDIA_MIN_SIZE
+            )
+        return isinstance(data, bytes) and len(data) >= MEDIA_MIN_SIZE
+
+    def get_link(self, data: Union[bytes, str]) -> str:
+        '''写入图片并返回`link://`链接, 会阻塞, 应在`executor`中调用'''
+        if isinstance(data, str):
+            data = b64decode(data[9:])
+        return f'link://{MEDIA_BASE_URL}{MEDIA_ROUTE}/{self.put(data)}'
+
+    async def link_content(self, content: List[Message]) -> List[Message]:
+        '''将消息中超过阈值的图片替换为`link://`链接, 不修改传入的消息'''
+        if not MEDIA_ENABLE:
+            return content
+        loop = asyncio.get_running_loop()
+        result: List[Message] = []
+        for msg in content:
+            if msg.type == 'image' and self.need_link(msg.data):
+                data = await loop.run_in_executor(
+                    self.executor, self.get_link, msg.data
+                )
+                result.append(Message(type='image', data=data))
+            elif msg.type == 'node' and isinstance(msg.data, list):
+                data = await self.link_content(msg.data)
+                result.append(Message(type='node', data=data))
+            else:
+                result.append(msg)
+        return result
+
+
+media_store = MediaStore()
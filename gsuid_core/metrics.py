@@ -0,0 +1,229 @@
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple, Union, Callable, Optional, Sequence
+
+# 默认的耗时分桶(秒)
+DEFAULT_BUCKETS = (
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+
+
+class Counter:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+
+class Gauge:
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        # 最后一格为+Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+    return f'{{{text}}}'
+
+
+class MetricFamily:
+    '''
+    同名指标按标签值划分的集合
+
+    `labels`返回的子指标会被缓存, 调用方应在初始化时取得并持有,
+    热路径上只做一次加法, 不产生新的对象
+    '''
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        type: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.type = type
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self.children: Dict[Tuple[str, ...], Metric] = {}
+
+    def labels(self, *values: str) -> Any:
+        child = self.children.get(values)
+        if child is None:
+            if self.type == 'counter':
+                child = Counter()
+            elif self.type == 'gauge':
+                child = Gauge()
+            else:
+                child = Histogram(self.buckets)
+            self.children[values] = child
+        return child
+
+    def clear(self):
+        self.children.clear()
+
+    def render(self) -> List[str]:
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type}',
+        ]
+        for values, child in self.children.items():
+            labels = dict(zip(self.labelnames, values))
+            if isinstance(child, Histogram):
+                total = 0
+                for bound, count in zip(
+                    list(child.buckets) + ['+Inf'], child.counts
+                ):
+                    total += count
+                    _labels = _format_labels({**labels, 'le': str(bound)})
+                    lines.append(f'{self.name}_bucket{_labels} {total}')
+                _labels = _format_labels(labels)
+                lines.append(f'{self.name}_sum{_labels} {child.sum}')
+                lines.append(f'{self.name}_count{_labels} {child.count}')
+            else:
+                lines.append(
+                    f'{self.name}{_format_labels(labels)} {child.value}'
+                )
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.families: Dict[str, MetricFamily] = {}
+        # 抓取时调用, 用于刷新由运行状态计算出的指标
+        self.collectors: List[Callable[[], None]] = []
+
+    def _add(
+        self,
+        name: str,
+        documentation: str,
+        type: str,
+        labelnames: Tuple[str, ...],
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> MetricFamily:
+        if name not in self.families:
+            self.families[name] = MetricFamily(
+                name, documentation, type, labelnames, buckets
+            )
+        return self.families[name]
+
+    def counter(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()
+    ) -> MetricFamily:
+        return self._add(name, documentation, 'counter', labelnames)
+
+    def gauge(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()
+    ) -> MetricFamily:
+        return self._add(name, documentation, 'gauge', labelnames)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Tuple[str, ...] = (),
+        buckets: Optional[Sequence[float]] = None,
+    ) -> MetricFamily:
+        return self._add(
+            name,
+            documentation,
+            'histogram',
+            labelnames,
+            buckets or DEFAULT_BUCKETS,
+        )
+
+    def add_collector(self, func: Callable[[], None]):
+        self.collectors.append(func)
+
+    def render(self) -> str:
+        for collector in self.collectors:
+            collector()
+        lines: List[str] = []
+        for family in self.families.values():
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+DISPATCH_SECONDS = registry.histogram(
+    'gsuid_dispatch_seconds', '单条消息在handle_event中的分发耗时'
+).labels()
+TRIGGER_HITS = registry.counter(
+    'gsuid_trigger_hits_total', '触发器命中次数', ('sv', 'trigger')
+)
+TRIGGER_SECONDS = registry.histogram(
+    'gsuid_trigger_seconds', '触发器执行耗时', ('sv', 'trigger')
+)
+MYS_REQUESTS = registry.counter(
+    'gsuid_mys_requests_total', '米游社API请求次数', ('retcode',)
+)
+DB_QUERY_SECONDS = registry.histogram(
+    'gsuid_db_query_seconds', '数据库语句执行耗时', ('operation',)
+)
+IMAGE_SECONDS = registry.histogram(
+    'gsuid_image_seconds', '图片绘制与编码耗时', ('stage',)
+)
+IMAGE_RENDER_SECONDS = IMAGE_SECONDS.labels('render')
+IMAGE_ENCODE_SECONDS = IMAGE_SECONDS.labels('encode')
+LOOP_LAG_SECONDS = registry.histogram(
+    'gsuid_loop_lag_seconds', '事件循环调度延迟'
+).labels()
+LOOP_BLOCKS = registry.counter(
+    'gsuid_loop_blocks_total', '事件循环被阻塞的次数', ('plugin',)
+)
+
+# 以下按连接划分的指标在抓取时由GsServer根据各连接的计数刷新
+FRAMES_IN = registry.counter('gsuid_frames_in_total', '收到的帧数', ('bot_id',))
+FRAMES_OUT = registry.counter('gsuid_frames_out_total', '发送的帧数', ('bot_id',))
+BYTES_IN = registry.counter('gsuid_bytes_in_total', '收到的字节数', ('bot_id',))
+BYTES_OUT = registry.counter('gsuid_bytes_out_total', '发送的字节数', ('bot_id',))
+QUEUE_SIZE = registry.gauge('gsuid_queue_size', '执行池中等待的任务数', ('bot_id',))
+RUNNING_TASKS = registry.gauge(
+    'gsuid_running_tasks', '执行池中正在运行的任务数', ('bot_id',)
+)
+INGEST_SIZE = registry.gauge('gsuid_ingest_size', '等待分发的消息数', ('bot_id',))
@@ -3,12 +3,13 @@ from typing import Any, List, Literal, Optional
 from msgspec import Struct
 
 
-class Message(Struct):
+# 消息结构之间不会形成循环引用, 关闭GC跟踪以减少回收开销
+class Message(Struct, gc=False):
     type: Optional[str] = None
     data: Optional[Any] = None
 
 
-class MessageReceive(Struct):
+class MessageReceive(Struct, gc=False):
     bot_id: str = 'Bot'
     bot_self_id: str = ''
     msg_id: str = ''
@@ -31,13 +32,24 @@ class Event(MessageReceive):
     reply: Optional[str] = None
     file_name: Optional[str] = None
     file: Optional[str] = None
-    file_type: Optional[Literal['url', 'base64']] = None
+    file_type: Optional[Literal['url', 'base64', 'spool']] = None
+    # file_type为spool时, file为落盘路径, 此处为SpoolFile
+    file_spool: Optional[Any] = None
 
 
-class MessageSend(Struct):
+class MessageSend(Struct, gc=False):
     bot_id: str = 'Bot'
     bot_self_id: str = ''
     msg_id: str = ''
     target_type: Optional[str] = None
     target_id: Optional[str] = None
     content: Optional[List[Message]] = None
+
+
+class MessageChunk(Struct, tag_field='type', tag='chunk', gc=False):
+    '''超大数据的分片帧, 按seq顺序拼接后即为消息中`chunk://{id}`对应的数据'''
+
+    id: str
+    seq: int
+    total: int
+    data: Any = None
@@ -0,0 +1,106 @@
+import os
+import atexit
+import asyncio
+import threading
+from pathlib import Path
+from hashlib import blake2b
+from itertools import count
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Tuple, Callable, Optional
+
+# 首次修改后等待该时间(秒)再写入, 期间的修改合并为一次
+FLUSH_DELAY = 0.5
+
+
+def atomic_write(path: Path, data: bytes):
+    '''先写入同目录的临时文件再替换, 避免中途退出留下不完整的文件'''
+    tmp = path.with_name(f'{path.name}.tmp')
+    with open(tmp, 'wb') as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
+    os.replace(tmp, path)
+
+
+def digest(data: bytes) -> bytes:
+    return blake2b(data, digest_size=16).digest()
+
+
+class WriteBehind:
+    '''
+    配置文件的延迟写入
+
+    `schedule`只记录需要写入的文件与序列化方法, 窗口期结束后在事件循环中
+    取一次快照, 交由后台线程原子写入; 同一文件在窗口期内的多次修改只写一次
+
+    没有运行中的事件循环时(启动阶段/脚本中)直接同步写入
+    '''
+
+    def __init__(self, delay: float = FLUSH_DELAY):
+        self.delay = delay
+        self.pending: Dict[Path, Callable[[], bytes]] = {}
+        self.handle: Optional[asyncio.TimerHandle] = None
+        self.executor = ThreadPoolExecutor(1, thread_name_prefix='gs_persist')
+        # 保证较旧的快照不会覆盖较新的
+        self.version = count(1)
+        self.written: Dict[Path, int] = {}
+        # 最近写入内容的摘要, 供文件监视区分是否为自身的写入
+        self.digests: Dict[Path, bytes] = {}
+        self.lock = threading.Lock()
+
+    def schedule(self, path: Path, dump: Callable[[], bytes]):
+        self.pending[path] = dump
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self.handle is None:
+            self.handle = loop.call_later(self.delay, self._flush_later)
+
+    def _snapshot(self) -> List[Tuple[Path, int, bytes]]:
+        if self.handle is not None:
+            self.handle.cancel()
+            self.handle = None
+        pending, self.pending = self.pending, {}
+        return [
+            (path, next(self.version), dump())
+            for path, dump in pending.items()
+        ]
+
+    def _flush_later(self):
+        self.handle = None
+        items = self._snapshot()
+        if items:
+            self.executor.submit(self._write, items)
+
+    def _write(self, items: List[Tuple[Path, int, bytes]]):
+        with self.lock:
+            for path, version, data in items:
+                if version <= self.written.get(path, 0):
+                    continue
+                self.digests[path] = digest(data)
+                try:
+                    atomic_write(path, data)
+                except OSError as e:
+                    from gsuid_core.logger import logger
+
+                    logger.error(f'[配置] 写入 {path} 失败: {e}')
+                    continue
+                self.written[path] = version
+
+    def flush(self):
+        '''立即同步写入所有待写入的文件'''
+        items = self._snapshot()
+        if items:
+            self._write(items)
+
+    async def aflush(self):
+        items = self._snapshot()
+        if items:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self.executor, self._write, items)
+
+
+write_behind = WriteBehind()
+atexit.register(write_behind.flush)
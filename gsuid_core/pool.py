@@ -0,0 +1,233 @@
+import time
+import asyncio
+from collections import deque
+from contextvars import copy_context
+from typing import Set, Dict, Deque, Optional, Coroutine
+
+from gsuid_core.logger import logger
+from gsuid_core.metrics import Histogram
+from gsuid_core.config import core_config
+
+pool_config = core_config.get_config('pool')
+MAX_TASKS: int = pool_config.get('max_tasks', 32)
+MAX_USER_TASKS: int = pool_config.get('max_user_tasks', 2)
+MAX_GROUP_TASKS: int = pool_config.get('max_group_tasks', 8)
+MAX_USER_QUEUE: int = pool_config.get('max_user_queue', 10)
+SHUTDOWN_TIMEOUT: float = pool_config.get('shutdown_timeout', 10)
+
+
+class HandlerJob:
+    __slots__ = (
+        'coro',
+        'user_id',
+        'group_id',
+        'priority',
+        'timer',
+        'name',
+        'context',
+        'enqueue_time',
+        'start_time',
+    )
+
+    def __init__(
+        self,
+        coro: Coroutine,
+        user_id: str,
+        group_id: Optional[str],
+        priority: int,
+        timer: Optional[Histogram] = None,
+        name: Optional[str] = None,
+    ):
+        self.coro = coro
+        self.user_id = user_id
+        self.group_id = group_id
+        self.priority = priority
+        self.timer = timer
+        self.name = name
+        # 保留提交时的上下文(如当前trace), 任务在该上下文中执行
+        self.context = copy_context()
+        self.enqueue_time = time.perf_counter()
+        self.start_time = 0.0
+
+
+class HandlerPool:
+    '''
+    每个_Bot的触发器执行池
+
+    限制全局同时运行的任务数, 并按用户分队列轮询调度,
+    同一用户/同一群同时运行的任务数也有上限, 避免单个用户刷屏饿死其他人
+
+    优先级数值越小越先执行, 可以越过普通任务
+    '''
+
+    def __init__(
+        self,
+        max_tasks: int = MAX_TASKS,
+        max_user_tasks: int = MAX_USER_TASKS,
+        max_group_tasks: int = MAX_GROUP_TASKS,
+        max_user_queue: int = MAX_USER_QUEUE,
+    ):
+        self.max_tasks = max_tasks
+        self.max_user_tasks = max_user_tasks
+        self.max_group_tasks = max_group_tasks
+        self.max_user_queue = max_user_queue
+
+        # 按用户划分的等待队列, 字典顺序即为轮询顺序
+        self.flows: Dict[str, Deque[HandlerJob]] = {}
+        self.running: Set[asyncio.Task] = set()
+        self.user_running: Dict[str, int] = {}
+        self.group_running: Dict[str, int] = {}
+        self._wakeup = asyncio.Event()
+
+        self.queue_size = 0
+        self.submitted = 0
+        self.finished = 0
+        self.dropped = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def qsize(self) -> int:
+        return self.queue_size
+
+    def is_full(self, user_id: str = '', group_id: Optional[str] = None):
+        '''该用户的等待队列已满, 提交的任务会被丢弃'''
+        flow = self.flows.get(f'{group_id}|{user_id}')
+        return flow is not None and len(flow) >= self.max_user_queue
+
+    def drop(self, user_id: str = ''):
+        self.dropped += 1
+        logger.warning(f'[执行池] 用户 {user_id} 待执行任务过多, 已丢弃...')
+
+    def put_nowait(
+        self,
+        coro: Coroutine,
+        user_id: str = '',
+        group_id: Optional[str] = None,
+        priority: int = 5,
+        timer: Optional[Histogram] = None,
+        name: Optional[str] = None,
+    ):
+        '''
+        timer用于记录任务的执行耗时, name为任务名, 用于定位阻塞的来源
+
+        队列已满时coro会被关闭, 若其中包装了其他协程, 应先通过`is_full`检查
+        '''
+        if self.is_full(user_id, group_id):
+            coro.close()
+            self.drop(user_id)
+            return
+
+        flow_key = f'{group_id}|{user_id}'
+        flow = self.flows.get(flow_key)
+        if flow is None:
+            flow = self.flows[flow_key] = deque()
+
+        flow.append(HandlerJob(coro, user_id, group_id, priority, timer, name))
+        self.queue_size += 1
+        self.submitted += 1
+        self._wakeup.set()
+
+    def _is_runnable(self, job: HandlerJob) -> bool:
+        if self.user_running.get(job.user_id, 0) >= self.max_user_tasks:
+            return False
+        if (
+            job.group_id
+            and self.group_running.get(job.group_id, 0) >= self.max_group_tasks
+        ):
+            return False
+        return True
+
+    def _pick(self) -> Optional[HandlerJob]:
+        best_key = None
+        best_job = None
+        for key, flow in self.flows.items():
+            job = flow[0]
+            if not self._is_runnable(job):
+                continue
+            if best_job is None or job.priority < best_job.priority:
+                best_key, best_job = key, job
+
+        if best_key is None or best_job is None:
+            return None
+
+        # 被调度的用户移到轮询队尾
+        flow = self.flows.pop(best_key)
+        flow.popleft()
+        if flow:
+            self.flows[best_key] = flow
+        self.queue_size -= 1
+        return best_job
+
+    def _start(self, job: HandlerJob):
+        job.start_time = time.perf_counter()
+        wait_time = job.start_time - job.enqueue_time
+        self.wait_time_total += wait_time
+        if wait_time > self.wait_time_max:
+            self.wait_time_max = wait_time
+
+        self.user_running[job.user_id] = (
+            self.user_running.get(job.user_id, 0) + 1
+        )
+        if job.group_id:
+            self.group_running[job.group_id] = (
+                self.group_running.get(job.group_id, 0) + 1
+            )
+
+        task = job.context.run(asyncio.create_task, job.coro, name=job.name)
+        self.running.add(task)
+        task.add_done_callback(lambda t: self._done(t, job))
+
+    def _done(self, task: asyncio.Task, job: HandlerJob):
+        self.running.discard(task)
+        self.finished += 1
+        if job.timer is not None:
+            job.timer.observe(time.perf_counter() - job.start_time)
+
+        self.user_running[job.user_id] -= 1
+        if not self.user_running[job.user_id]:
+            del self.user_running[job.user_id]
+        if job.group_id:
+            self.group_running[job.group_id] -= 1
+            if not self.group_running[job.group_id]:
+                del self.group_running[job.group_id]
+
+        if not task.cancelled() and task.exception() is not None:
+            logger.opt(exception=task.exception()).error('[执行池] 任务执行出错:')
+        self._wakeup.set()
+
+    async def process(self):
+        while True:
+            while len(self.running) < self.max_tasks:
+                job = self._pick()
+                if job is None:
+                    break
+                self._start(job)
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def shutdown(self, timeout: float = SHUTDOWN_TIMEOUT):
+        '''丢弃尚未开始的任务, 等待执行中的任务至多timeout秒后取消'''
+        for flow in self.flows.values():
+            for job in flow:
+                job.coro.close()
+        self.flows.clear()
+        self.queue_size = 0
+
+        if self.running:
+            _, pending = await asyncio.wait(self.running, timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, float]:
+        started = self.submitted - self.queue_size
+        return {
+            'queue_size': self.queue_size,
+            'running': len(self.running),
+            'submitted': self.submitted,
+            'finished': self.finished,
+            'dropped': self.dropped,
+            'wait_time_avg': self.wait_time_total / started if started else 0,
+            'wait_time_max': self.wait_time_max,
+        }
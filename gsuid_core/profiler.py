@@ -0,0 +1,228 @@
+import sys
+import time
+import asyncio
+import datetime
+import threading
+from pathlib import Path
+from types import FrameType
+from collections import Counter
+from functools import wraps, lru_cache
+from typing import Any, Dict, List, Callable, Optional, Coroutine
+
+from gsuid_core.logger import logger
+
+# 采样间隔与单次采样的最长时间(秒)
+SAMPLE_INTERVAL = 0.005
+MAX_SECONDS = 600
+ROOT_PATH = Path(__file__).resolve().parents[1]
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    try:
+        return Path(filename).resolve().relative_to(ROOT_PATH).as_posix()
+    except ValueError:
+        return Path(filename).name
+
+
+def _frame_name(frame: FrameType) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({_short_path(code.co_filename)}:{frame.f_lineno})'
+
+
+def _running_stack(frame: FrameType, coro: Coroutine) -> Optional[List[str]]:
+    '''事件循环线程当前的调用栈中, 从处理函数开始的部分'''
+    root = coro.cr_frame
+    stack: List[str] = []
+    f: Optional[FrameType] = frame
+    while f is not None:
+        stack.append(_frame_name(f))
+        if f is root:
+            stack.reverse()
+            return stack
+        f = f.f_back
+    return None
+
+
+def _await_stack(coro: Coroutine) -> List[str]:
+    '''沿await链取得挂起中的协程的调用栈'''
+    stack: List[str] = []
+    obj: Any = coro
+    while obj is not None:
+        frame = getattr(obj, 'cr_frame', None) or getattr(
+            obj, 'gi_frame', None
+        )
+        if frame is None:
+            break
+        stack.append(_frame_name(frame))
+        obj = getattr(obj, 'cr_await', None) or getattr(
+            obj, 'gi_yieldfrom', None
+        )
+    stack.append('[await]')
+    return stack
+
+
+class ProfileSession:
+    '''一次针对某个SV(或其中一个触发器)的采样'''
+
+    def __init__(self, sv: str, trigger: str, seconds: float):
+        self.sv = sv
+        self.trigger = trigger
+        self.seconds = seconds
+        self.start_at = time.time()
+        self.deadline = time.perf_counter() + seconds
+        self.finished = False
+        # 正在执行的处理函数所在的任务与处理函数的协程
+        self.tasks: Dict[asyncio.Task, Coroutine] = {}
+        self.wall: Counter = Counter()
+        self.cpu: Counter = Counter()
+        self.calls = 0
+        self.samples = 0
+
+    def match(self, sv_name: str, trigger: str) -> bool:
+        return (
+            not self.finished
+            and sv_name == self.sv
+            and (not self.trigger or trigger == self.trigger)
+        )
+
+    async def run(self, coro: Coroutine):
+        task = asyncio.current_task()
+        if task is None:
+            return await coro
+        self.calls += 1
+        self.tasks[task] = coro
+        try:
+            return await coro
+        finally:
+            self.tasks.pop(task, None)
+
+    def collapsed(self, kind: str = 'wall') -> str:
+        '''flamegraph.pl/speedscope可读取的折叠栈格式, 数值单位为微秒'''
+        counter = self.cpu if kind == 'cpu' else self.wall
+        lines = [
+            f'{stack} {int(value * 1e6)}'
+            for stack, value in counter.most_common()
+            if value >= 1e-6
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+class HandlerProfiler:
+    '''
+    针对单个SV或触发器的采样分析器, 可以在运行中开启
+
+    采样线程定时检查正在执行的处理函数: 处理函数正占用事件循环时,
+    取事件循环线程的调用栈, 同时计入墙钟时间与事件循环线程的CPU时间;
+    处理函数挂起等待时, 沿await链取得调用栈, 只计入墙钟时间
+    '''
+
+    def __init__(self):
+        self.session: Optional[ProfileSession] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread_id = 0
+        self.cpu_clock: Optional[int] = None
+
+    def start(
+        self, sv: str, trigger: str = '', seconds: float = 30
+    ) -> ProfileSession:
+        if self.session is not None and not self.session.finished:
+            raise ValueError('已有正在进行的采样')
+
+        self.loop = asyncio.get_running_loop()
+        self.thread_id = threading.get_ident()
+        try:
+            self.cpu_clock = time.pthread_getcpuclockid(self.thread_id)
+        except (AttributeError, OSError):
+            # 不支持时以墙钟时间代替
+            self.cpu_clock = None
+
+        seconds = min(max(seconds, 1), MAX_SECONDS)
+        session = self.session = ProfileSession(sv, trigger, seconds)
+        threading.Thread(
+            target=self._sample_loop,
+            args=(session,),
+            name='gs_profiler',
+            daemon=True,
+        ).start()
+        logger.info(f'[性能采样] 开始采样 {sv} {trigger}, 持续 {seconds}s')
+        return session
+
+    def stop(self):
+        if self.session is not None:
+            self.session.finished = True
+
+    def _cpu_time(self) -> float:
+        if self.cpu_clock is None:
+            return time.perf_counter()
+        return time.clock_gettime(self.cpu_clock)
+
+    def _sample_loop(self, session: ProfileSession):
+        last = time.perf_counter()
+        last_cpu = self._cpu_time()
+        while not session.finished:
+            time.sleep(SAMPLE_INTERVAL)
+            now = time.perf_counter()
+            cpu = self._cpu_time()
+            self._sample(session, now - last, cpu - last_cpu)
+            last, last_cpu = now, cpu
+            if now >= session.deadline:
+                session.finished = True
+        logger.info(
+            f'[性能采样] {session.sv} 采样结束, '
+            f'共 {session.calls} 次调用, {session.samples} 次采样'
+        )
+
+    def _sample(self, session: ProfileSession, wall: float, cpu: float):
+        tasks = list(session.tasks.items())
+        if not tasks:
+            return
+        session.samples += 1
+        running = asyncio.current_task(self.loop)
+        frame = sys._current_frames().get(self.thread_id)
+        for task, coro in tasks:
+            stack = None
+            if task is running and frame is not None:
+                stack = _running_stack(frame, coro)
+            if stack is not None:
+                key = ';'.join(stack)
+                session.wall[key] += wall
+                session.cpu[key] += cpu
+            else:
+                session.wall[';'.join(_await_stack(coro))] += wall
+        del frame
+
+    def status(self) -> Dict[str, Any]:
+        session = self.session
+        if session is None:
+            return {'active': False, 'sv': '', 'trigger': '', 'calls': 0}
+        remaining = session.deadline - time.perf_counter()
+        return {
+            'active': not session.finished,
+            'sv': session.sv,
+            'trigger': session.trigger,
+            'seconds': session.seconds,
+            'start_at': datetime.datetime.fromtimestamp(
+                session.start_at
+            ).strftime('%m-%d %H:%M:%S'),
+            'remaining': 0 if session.finished else round(remaining, 1),
+            'calls': session.calls,
+            'samples': session.samples,
+            'stacks': len(session.wall),
+        }
+
+
+profiler = HandlerProfiler()
+
+
+def profiled(func: Callable, sv_name: str, trigger: str) -> Callable:
+    '''处理函数仅在被选中采样时经过ProfileSession'''
+
+    @wraps(func)
+    async def wrapper(bot, msg):
+        session = profiler.session
+        if session is None or not session.match(sv_name, trigger):
+            return await func(bot, msg)
+        return await session.run(func(bot, msg))
+
+    return wrapper
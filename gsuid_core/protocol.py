@@ -0,0 +1,39 @@
+from typing import Any, Literal, Callable
+
+from msgspec import msgpack
+from msgspec import json as msgjson
+
+from gsuid_core.models import MessageReceive
+
+PROTOCOL = Literal['json', 'msgpack']
+PROTOCOL_LIST = ('json', 'msgpack')
+
+
+# 编解码器在进程内复用, 避免每帧重新解析类型信息
+json_encoder = msgjson.Encoder()
+json_decoder = msgjson.Decoder(MessageReceive)
+msgpack_encoder = msgpack.Encoder()
+msgpack_decoder = msgpack.Decoder(MessageReceive)
+
+
+def get_encoder(protocol: PROTOCOL) -> Callable[[Any], bytes]:
+    if protocol == 'msgpack':
+        return msgpack_encoder.encode
+    return json_encoder.encode
+
+
+def get_decoder(protocol: PROTOCOL) -> Callable[[bytes], MessageReceive]:
+    if protocol == 'msgpack':
+        return msgpack_decoder.decode
+    return json_decoder.decode
+
+
+def get_batch_header(protocol: PROTOCOL, length: int) -> bytes:
+    '''合并帧的数组头, json使用`[`, msgpack使用array类型头'''
+    if protocol == 'json':
+        return b'['
+    if length < 16:
+        return bytes([0x90 | length])
+    elif length < 65536:
+        return b'\xdc' + length.to_bytes(2, 'big')
+    return b'\xdd' + length.to_bytes(4, 'big')
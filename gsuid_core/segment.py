@@ -1,11 +1,12 @@
-from io import BytesIO
 from pathlib import Path
-from base64 import b64encode
-from typing import List, Union, Literal
+from base64 import b64decode, b64encode
+from typing import List, Tuple, Union, Literal, Optional
 
 from PIL import Image
 
 from gsuid_core.models import Message
+from gsuid_core.chunk import Payload, take_chunk
+from gsuid_core.utils.image.encoder import IMAGE_FORMAT, PendingImage
 
 
 class MessageSegment:
@@ -13,12 +14,21 @@ class MessageSegment:
         return [self, other]
 
     @staticmethod
-    def image(img: Union[str, Image.Image, bytes, Path]) -> Message:
+    def image(
+        img: Union[str, Image.Image, bytes, Path],
+        format: Optional[IMAGE_FORMAT] = None,
+        quality: Optional[int] = None,
+        target_size: Optional[int] = None,
+    ) -> Message:
+        '''
+        PIL图片会在发送时于线程池中编码,
+        格式/质量/目标大小未指定时使用配置中的默认值
+        '''
         if isinstance(img, Image.Image):
-            img = img.convert('RGB')
-            result_buffer = BytesIO()
-            img.save(result_buffer, format='PNG', quality=80, subsampling=0)
-            img = result_buffer.getvalue()
+            return Message(
+                type='image',
+                data=PendingImage(img, format, quality, target_size),
+            )
         elif isinstance(img, bytes):
             pass
         elif isinstance(img, Path):
@@ -31,8 +41,8 @@ class MessageSegment:
                 return Message(type='image', data=img)
             with open(img, 'rb') as fp:
                 img = fp.read()
-        msg = Message(type='image', data=f'base64://{b64encode(img).decode()}')
-        return msg
+        # 保留原始bytes, 发送时再按连接协议编码
+        return Message(type='image', data=img)
 
     @staticmethod
     def text(content: str) -> Message:
@@ -72,10 +82,10 @@ class MessageSegment:
                 content = fp.read()
         else:
             if content.startswith('base64://'):
-                return Message(type='image', data=content)
+                return Message(type='record', data=content)
             with open(content, 'rb') as fp:
                 content = fp.read()
-        return Message(type='record', data=f'base64://{content}')
+        return Message(type='record', data=content)
 
     @staticmethod
     def file(content: Union[Path, str, bytes], file_name: str) -> Message:
@@ -94,13 +104,83 @@ class MessageSegment:
             else:
                 with open(content, 'rb') as fp:
                     file = fp.read()
-        return Message(
-            type='file',
-            data=f'{file_name}|{b64encode(file).decode()}',
-        )
+        return Message(type='file', data=(file_name, file))
 
     @staticmethod
     def log(
         type: Literal['INFO', 'WARNING', 'ERROR', 'SUCCESS'], content: str
     ) -> Message:
         return Message(type=f'log_{type}', data=content)
+
+
+def _encode_payload(data, is_binary: bool, chunks=None):
+    is_base64 = isinstance(data, str) and data.startswith('base64://')
+    if isinstance(data, bytes) or is_base64:
+        chunk = take_chunk(data, chunks)
+        if chunk is not None:
+            return chunk
+
+    if isinstance(data, bytes):
+        if is_binary:
+            return data
+        return f'base64://{b64encode(data).decode()}'
+    elif is_binary and is_base64:
+        return b64decode(data[9:])
+    return data
+
+
+def _encode_file(data, is_binary: bool, chunks=None):
+    if isinstance(data, str):
+        if '|' not in data or (not is_binary and chunks is None):
+            return data
+        file_name, file = data.split('|', 1)
+        if file.startswith(('link://', 'http')):
+            return data
+        chunk = take_chunk(file, chunks)
+        if chunk is not None:
+            return f'{file_name}|{chunk}'
+        if not is_binary:
+            return data
+        return [file_name, b64decode(file)]
+    else:
+        file_name, file = data
+        chunk = take_chunk(file, chunks)
+        if chunk is not None:
+            return f'{file_name}|{chunk}'
+        if is_binary:
+            return [file_name, file]
+        return f'{file_name}|{b64encode(file).decode()}'
+
+
+def encode_content(
+    content: List[Message],
+    is_binary: bool,
+    chunks: Optional[List[Tuple[str, Payload]]] = None,
+) -> List[Message]:
+    '''
+    按连接协议转换消息中的二进制数据, 不修改传入的消息
+
+    json协议下图片/语音为`base64://`字符串, 文件为`文件名|base64`
+
+    msgpack协议下图片/语音为原始bytes, 文件为`[文件名, bytes]`
+
+    `link://`链接保持不变
+
+    传入chunks时, 超过分片大小的数据会被替换为`chunk://{id}`引用,
+    文件则为`文件名|chunk://{id}`, 原始数据登记在chunks中由调用方分片发送
+    '''
+    result: List[Message] = []
+    for msg in content:
+        if msg.type == 'image':
+            data = _encode_payload(msg.data, is_binary, chunks)
+        elif msg.type == 'record':
+            data = _encode_payload(msg.data, is_binary, chunks)
+        elif msg.type == 'file' and msg.data:
+            data = _encode_file(msg.data, is_binary, chunks)
+        elif msg.type == 'node' and isinstance(msg.data, list):
+            data = encode_content(msg.data, is_binary, chunks)
+        else:
+            result.append(msg)
+            continue
+        result.append(Message(type=msg.type, data=data))
+    return result
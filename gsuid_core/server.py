@@ -2,12 +2,24 @@ import sys
 import asyncio
 import importlib
 from pathlib import Path
-from typing import Dict, Callable
+from weakref import WeakSet
+from typing import Dict, Callable, Optional
 
 from fastapi import WebSocket
 
 from gsuid_core.bot import _Bot
 from gsuid_core.logger import logger
+from gsuid_core.protocol import PROTOCOL
+from gsuid_core.metrics import (
+    BYTES_IN,
+    BYTES_OUT,
+    FRAMES_IN,
+    FRAMES_OUT,
+    QUEUE_SIZE,
+    INGEST_SIZE,
+    RUNNING_TASKS,
+    registry,
+)
 
 
 class GsServer:
@@ -26,8 +38,32 @@ class GsServer:
         if not self.is_initialized:
             self.active_ws: Dict[str, WebSocket] = {}
             self.active_bot: Dict[str, _Bot] = {}
+            # 所有仍存活的_Bot, 断开后未被回收的即为泄漏
+            self.all_bot: 'WeakSet[_Bot]' = WeakSet()
+            registry.add_collector(self.collect_metrics)
             self.is_initialized = True
 
+    def collect_metrics(self):
+        families = (
+            FRAMES_IN,
+            FRAMES_OUT,
+            BYTES_IN,
+            BYTES_OUT,
+            QUEUE_SIZE,
+            RUNNING_TASKS,
+            INGEST_SIZE,
+        )
+        for family in families:
+            family.clear()
+        for bot_id, bot in self.active_bot.items():
+            FRAMES_IN.labels(bot_id).value = bot.frames_in
+            FRAMES_OUT.labels(bot_id).value = bot.writer.frames_out
+            BYTES_IN.labels(bot_id).value = bot.bytes_in
+            BYTES_OUT.labels(bot_id).value = bot.writer.bytes_out
+            QUEUE_SIZE.labels(bot_id).set(bot.queue.qsize())
+            RUNNING_TASKS.labels(bot_id).set(len(bot.queue.running))
+            INGEST_SIZE.labels(bot_id).set(bot.ingest.qsize())
+
     def load_plugins(self):
         logger.info('开始导入插件...')
         sys.path.append(str(Path(__file__).parents[1]))
@@ -76,11 +112,21 @@ class GsServer:
                         _p = f'plugins.{name}.{sub_plugin.name}'
                     importlib.import_module(f'{_p}.__init__')
 
-    async def connect(self, websocket: WebSocket, bot_id: str) -> _Bot:
+    async def connect(
+        self,
+        websocket: WebSocket,
+        bot_id: str,
+        is_batch: bool = False,
+        protocol: PROTOCOL = 'json',
+        is_chunk: bool = False,
+    ) -> _Bot:
         await websocket.accept()
         self.active_ws[bot_id] = websocket
-        self.active_bot[bot_id] = bot = _Bot(bot_id, websocket)
-        logger.info(f'{bot_id}已连接！')
+        self.active_bot[bot_id] = bot = _Bot(
+            bot_id, websocket, is_batch, protocol, is_chunk
+        )
+        self.all_bot.add(bot)
+        logger.info(f'{bot_id}已连接！协议: {protocol}')
         try:
             _task = [_def() for _def in self.bot_connect_def]
             asyncio.gather(*_task)
@@ -88,15 +134,30 @@ class GsServer:
             logger.exception(e)
         return bot
 
-    def disconnect(self, bot_id: str):
+    def disconnect(self, bot_id: str, bot: Optional[_Bot] = None):
+        # 同一bot_id可能已经重连, 此时不应移除新的连接
+        if bot is not None and self.active_bot.get(bot_id) is not bot:
+            logger.warning(f'{bot_id}旧连接已中断！')
+            return
         if bot_id in self.active_ws:
             del self.active_ws[bot_id]
         if bot_id in self.active_bot:
             del self.active_bot[bot_id]
         logger.warning(f'{bot_id}已中断！')
 
+    def get_bot_status(self) -> Dict[str, int]:
+        active = set(self.active_bot.values())
+        alive = list(self.all_bot)
+        return {
+            'active': len(active),
+            'closing': sum(
+                1 for b in alive if b not in active and not b.is_closed
+            ),
+            'leaked': sum(1 for b in alive if b not in active and b.is_closed),
+        }
+
     async def send(self, message: str, bot_id: str):
-        await self.active_ws[bot_id].send_text(message)
+        await self.active_bot[bot_id].writer.send_text(message)
 
     async def broadcast(self, message: str):
         for bot_id in self.active_ws:
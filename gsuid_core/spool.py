@@ -0,0 +1,130 @@
+import mmap
+import asyncio
+import weakref
+from uuid import uuid4
+from pathlib import Path
+from base64 import b64decode, b64encode
+from typing import Union, Optional, Coroutine, AsyncIterator
+
+import aiofiles
+
+from gsuid_core.config import core_config
+from gsuid_core.data_store import get_res_path
+
+SPOOL_SIZE: int = core_config.get_config('ingest').get('spool_size', 0)
+SPOOL_PATH = get_res_path('spool')
+# 每次解码写入的base64长度, 需为4的倍数
+DECODE_STEP = 4 * 65536
+
+
+def _remove(path: Path):
+    try:
+        path.unlink()
+    except OSError:
+        pass
+
+
+def _write(path: Path, data: Union[str, bytes]):
+    with open(path, 'wb') as fp:
+        if isinstance(data, bytes):
+            fp.write(data)
+            return
+        for start in range(0, len(data), DECODE_STEP):
+            end = start + DECODE_STEP
+            fp.write(b64decode(data[start:end]))
+
+
+def clean_spool():
+    '''启动时删除上次运行遗留的文件, 未开启落盘时不做任何处理'''
+    if SPOOL_SIZE <= 0:
+        return
+    for path in SPOOL_PATH.iterdir():
+        _remove(path)
+
+
+def need_spool(data: Union[str, bytes]) -> bool:
+    '''base64的长度约为原始数据的4/3, SPOOL_SIZE为0时不落盘'''
+    if SPOOL_SIZE <= 0:
+        return False
+    if isinstance(data, str):
+        return len(data) * 3 // 4 >= SPOOL_SIZE
+    return len(data) >= SPOOL_SIZE
+
+
+class SpoolFile:
+    '''
+    落盘的入站文件, 只解码一次, 所有触发器共享同一份
+
+    handle_event按触发的任务数引用计数, 全部执行完毕后删除文件,
+    即便任务未能执行, 对象被回收时也会删除
+    '''
+
+    def __init__(self, file_name: str, path: Path, size: int):
+        self.file_name = file_name
+        self.path = path
+        self.size = size
+        self._refs = 1
+        self._mmap: Optional[mmap.mmap] = None
+        self._finalizer = weakref.finalize(self, _remove, path)
+
+    @classmethod
+    async def create(
+        cls, file_name: str, data: Union[str, bytes]
+    ) -> 'SpoolFile':
+        '''在线程中逐段解码base64并写入, data也可以是原始bytes'''
+        path = SPOOL_PATH / f'{uuid4().hex}{Path(file_name).suffix}'
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, _write, path, data)
+        return cls(file_name, path, path.stat().st_size)
+
+    def read_bytes(self) -> bytes:
+        return self.path.read_bytes()
+
+    async def read(self) -> bytes:
+        async with aiofiles.open(self.path, 'rb') as fp:
+            return await fp.read()
+
+    async def iter_chunks(self, size: int = 65536) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.path, 'rb') as fp:
+            while True:
+                data = await fp.read(size)
+                if not data:
+                    break
+                yield data
+
+    def memoryview(self) -> memoryview:
+        '''以只读内存映射的方式访问文件, 不会整体读入内存'''
+        if self._mmap is None:
+            with open(self.path, 'rb') as fp:
+                self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def base64(self) -> str:
+        '''兼容原先`ev.file`的base64字符串'''
+        return b64encode(self.read_bytes()).decode()
+
+    def hold(self, coro: Coroutine) -> Coroutine:
+        '''增加一次引用, 在coro执行结束后释放'''
+        self._refs += 1
+        return self._run(coro)
+
+    async def _run(self, coro: Coroutine):
+        try:
+            return await coro
+        finally:
+            self.release()
+
+    def release(self):
+        self._refs -= 1
+        if self._refs <= 0:
+            self.cleanup()
+
+    def cleanup(self):
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # 仍有memoryview未释放, 交由回收时处理
+                return
+            self._mmap = None
+        self._finalizer()
@@ -1,27 +1,90 @@
 from __future__ import annotations
 
+import re
 import traceback
 from pathlib import Path
+from copy import deepcopy
 from functools import wraps
-from typing import Dict, List, Tuple, Union, Literal, Callable, Optional
+from collections import OrderedDict
+from typing import (
+    Set,
+    Dict,
+    List,
+    Tuple,
+    Union,
+    Literal,
+    Callable,
+    Optional,
+    FrozenSet,
+)
 
 from gsuid_core.logger import logger
 from gsuid_core.trigger import Trigger
+from gsuid_core.profiler import profiled
 from gsuid_core.config import core_config
+from gsuid_core.trigger_index import trigger_index
+
+AVAILABLE_CACHE_SIZE = 4096
 
 
 class SVList:
     def __init__(self):
         self.lst: Dict[str, SV] = {}
         self.detail_lst: Dict[str, List[SV]] = {}
+        # (group_id, user_id, user_pm) -> 可用的SV名称
+        self.available_cache: OrderedDict[
+            Tuple[Optional[str], str, int], FrozenSet[str]
+        ] = OrderedDict()
 
     @property
     def get_lst(self):
         return self.lst
 
+    def get_available(
+        self, group_id: Optional[str], user_id: str, user_pm: int
+    ) -> FrozenSet[str]:
+        '''
+        返回该用户在该群(或私聊)中可触发的SV名称集合
+
+        结果会被缓存, 只有SV的规则发生变化时才会失效
+        '''
+        key = (group_id, user_id, user_pm)
+        cache = self.available_cache
+        if key in cache:
+            cache.move_to_end(key)
+            return cache[key]
+
+        available = frozenset(
+            name
+            for name, sv in self.lst.items()
+            if sv.is_available(group_id, user_id, user_pm)
+        )
+        cache[key] = available
+        if len(cache) > AVAILABLE_CACHE_SIZE:
+            cache.popitem(last=False)
+        return available
+
+    def clear_available_cache(self):
+        self.available_cache.clear()
+
 
 SL = SVList()
 config_sv = core_config.get_config('sv')
+# 上次应用到SV的配置, 配置被重新载入时只应用有变化的SV
+_applied_sv: Dict[str, Dict] = deepcopy(config_sv)
+
+
+sv_handle = core_config.handle('sv')
+
+
+@sv_handle.subscribe
+def _apply_sv_config(config: Dict):
+    for name, data in config.items():
+        if _applied_sv.get(name) == data:
+            continue
+        _applied_sv[name] = deepcopy(data)
+        if name in SL.lst:
+            SL.lst[name].apply_config(data)
 
 
 class SV:
@@ -61,6 +124,7 @@ class SV:
             # sv内包含的触发器
             self.TL: Dict[str, Trigger] = {}
             self.is_initialized = True
+            trigger_index.add_sv(self)
             stack = traceback.extract_stack()
             file = stack[-2].filename
             path = Path(file)
@@ -110,13 +174,56 @@ class SV:
                 self.pm = 0
                 self.enabled = False
 
+            self.compile_rule()
+
+    def compile_rule(self):
+        '''将黑白名单编译为集合, 并使可用SV的缓存失效'''
+        self._black_set: Set[Optional[str]] = set(self.black_list)
+        self._white_set: Set[Optional[str]] = set(self.white_list)
+        self._white_set.discard('')
+        SL.clear_available_cache()
+
+    def is_available(
+        self, group_id: Optional[str], user_id: str, user_pm: int
+    ) -> bool:
+        if not self.enabled or user_pm > self.pm:
+            return False
+        if group_id in self._black_set or user_id in self._black_set:
+            return False
+        if not (
+            self.area == 'ALL'
+            or (self.area == 'GROUP' and group_id)
+            or (self.area == 'DIRECT' and not group_id)
+        ):
+            return False
+        if self._white_set and not (
+            user_id in self._white_set or group_id in self._white_set
+        ):
+            return False
+        return True
+
+    def apply_config(self, data: Dict):
+        '''应用配置文件中的设置, 不会写回'''
+        for var in (
+            'priority',
+            'enabled',
+            'pm',
+            'black_list',
+            'area',
+            'white_list',
+        ):
+            if var in data:
+                setattr(self, var, data[var])
+        self.compile_rule()
+
     def set(self, **kwargs):
+        if self.name not in config_sv:
+            config_sv[self.name] = {}
         for var in kwargs:
             setattr(self, var, kwargs[var])
-            if self.name not in config_sv:
-                config_sv[self.name] = {}
             config_sv[self.name][var] = kwargs[var]
-            core_config.set_config('sv', config_sv)
+        core_config.set_config('sv', config_sv)
+        self.compile_rule()
 
     def enable(self):
         self.set(enabled=True)
@@ -147,8 +254,21 @@ class SV:
 
             for _k in keyword_list:
                 if _k not in self.TL:
+                    try:
+                        trigger = Trigger(
+                            type,
+                            _k,
+                            profiled(func, self.name, _k),
+                            block,
+                            to_me,
+                            self.name,
+                        )
+                    except re.error as e:
+                        logger.error(f'载入{type}触发器【{_k}】失败: {e}')
+                        continue
                     logger.info(f'载入{type}触发器【{_k}】!')
-                    self.TL[_k] = Trigger(type, _k, func, block, to_me)
+                    self.TL[_k] = trigger
+                    trigger_index.add(self, trigger)
 
             @wraps(func)
             async def wrapper(bot, msg) -> Optional[Callable]:
@@ -0,0 +1,140 @@
+'''
+对比每帧调用 msgjson.decode/encode 与复用 Decoder/Encoder,
+以及 array_like 结构在不同消息大小下的解码、处理、编码吞吐
+
+python gsuid_core/tools/bench_codec.py
+'''
+import gc
+import sys
+import time
+import asyncio
+from pathlib import Path
+from base64 import b64encode
+from typing import Any, List, Literal, Callable, Optional
+
+from msgspec import Struct
+from msgspec import json as msgjson
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from gsuid_core.handler import msg_process  # noqa: E402
+from gsuid_core.protocol import json_decoder, json_encoder  # noqa: E402
+from gsuid_core.models import Message, MessageSend, MessageReceive  # noqa
+
+ROUNDS = 20000
+GC_OBJECTS = 200000
+
+
+class ArrayMessage(Struct, array_like=True, gc=False):
+    type: Optional[str] = None
+    data: Optional[Any] = None
+
+
+class ArrayReceive(Struct, array_like=True, gc=False):
+    bot_id: str = 'Bot'
+    bot_self_id: str = ''
+    msg_id: str = ''
+    user_type: Literal['group', 'direct', 'channel', 'sub_channel'] = 'group'
+    group_id: Optional[str] = None
+    user_id: str = ''
+    user_pm: int = 3
+    content: List[ArrayMessage] = []
+
+
+class ArraySend(Struct, array_like=True, gc=False):
+    bot_id: str = 'Bot'
+    bot_self_id: str = ''
+    msg_id: str = ''
+    target_type: Optional[str] = None
+    target_id: Optional[str] = None
+    content: Optional[List[ArrayMessage]] = None
+
+
+class TrackedMessage(Struct):
+    type: Optional[str] = None
+    data: Optional[Any] = None
+
+
+def make_content(size: int, message_type=Message) -> List:
+    content = [message_type('text', '原神抽卡记录')]
+    if size:
+        image = f'base64://{b64encode(b"0" * size).decode()}'
+        content.append(message_type('image', image))
+    return content
+
+
+def timeit(func: Callable, rounds: int = ROUNDS) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        func()
+    return rounds / (time.perf_counter() - start)
+
+
+def bench_size(size: int):
+    receive = MessageReceive(
+        user_id='444835641', group_id='1234567', content=make_content(size)
+    )
+    array_receive = ArrayReceive(
+        user_id='444835641',
+        group_id='1234567',
+        content=make_content(size, ArrayMessage),
+    )
+    send = MessageSend(target_id='1234567', content=make_content(size))
+    array_send = ArraySend(
+        target_id='1234567', content=make_content(size, ArrayMessage)
+    )
+    frame = msgjson.encode(receive)
+    array_frame = msgjson.encode(array_receive)
+    rounds = ROUNDS if size < 65536 else ROUNDS // 20
+
+    decode = timeit(lambda: msgjson.decode(frame, type=MessageReceive), rounds)
+    decoder = timeit(lambda: json_decoder.decode(frame), rounds)
+    array_decoder = msgjson.Decoder(ArrayReceive)
+    array_decode = timeit(lambda: array_decoder.decode(array_frame), rounds)
+
+    loop = asyncio.new_event_loop()
+    process = timeit(
+        lambda: loop.run_until_complete(
+            msg_process(json_decoder.decode(frame))
+        ),
+        rounds,
+    )
+    loop.close()
+
+    encode = timeit(lambda: msgjson.encode(send), rounds)
+    encoder = timeit(lambda: json_encoder.encode(send), rounds)
+    array_encode = timeit(lambda: json_encoder.encode(array_send), rounds)
+
+    print(
+        f'{size / 1024:>6.0f}KB 帧 {len(frame):>7}B / '
+        f'array {len(array_frame):>7}B\n'
+        f'  解码 decode {decode:>9.0f}/s, Decoder {decoder:>9.0f}/s, '
+        f'array {array_decode:>9.0f}/s\n'
+        f'  解码+处理 {process:>9.0f}/s\n'
+        f'  编码 encode {encode:>9.0f}/s, Encoder {encoder:>9.0f}/s, '
+        f'array {array_encode:>9.0f}/s'
+    )
+
+
+def bench_gc():
+    for message_type in (TrackedMessage, Message):
+        # 仅含标量字段的Struct会被msgspec自动取消跟踪, 这里使用列表数据
+        objects = [message_type('node', [str(i)]) for i in range(GC_OBJECTS)]
+        start = time.perf_counter()
+        gc.collect()
+        cost = time.perf_counter() - start
+        print(
+            f'{GC_OBJECTS} 个存活的 {message_type.__name__}'
+            f'(gc={gc.is_tracked(objects[0])}), '
+            f'完整回收耗时 {cost * 1000:.1f}ms'
+        )
+        del objects
+
+
+def main():
+    for size in (0, 1024, 65536, 1048576):
+        bench_size(size)
+    bench_gc()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+'''
+对比默认的aiosqlite设置(每个会话新开连接, 无pragma)
+与WAL + pragma + 只读连接池/单写连接在读写混合负载下的吞吐
+
+python gsuid_core/tools/bench_db.py
+'''
+import sys
+import time
+import random
+import asyncio
+import tempfile
+from typing import Type
+from pathlib import Path
+
+from sqlalchemy import update
+from sqlmodel import SQLModel
+from sqlalchemy.future import select
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from gsuid_core.utils.database.models import GsBind  # noqa: E402
+from gsuid_core.utils.database.base_models import (  # noqa: E402
+    READ_PRAGMAS,
+    WRITE_PRAGMAS,
+    RoutingSession,
+    make_engine,
+)
+
+USERS = 2000
+OPERATIONS = 4000
+CONCURRENCY = 16
+WRITE_RATIO = 0.2
+
+
+async def prepare(engine: AsyncEngine, maker: sessionmaker):
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    async with maker() as session:
+        for i in range(USERS):
+            session.add(GsBind(bot_id='bench', user_id=str(i), uid=str(i)))
+        await session.commit()
+
+
+async def worker(maker: sessionmaker, count: int, counter: list):
+    for _ in range(count):
+        user_id = str(random.randrange(USERS))
+        async with maker() as session:
+            if random.random() < WRITE_RATIO:
+                await session.execute(
+                    update(GsBind)
+                    .where(GsBind.user_id == user_id)
+                    .values(group_id=str(time.time()))
+                )
+                await session.commit()
+                counter[1] += 1
+            else:
+                result = await session.execute(
+                    select(GsBind).where(GsBind.user_id == user_id)
+                )
+                result.scalars().all()
+                counter[0] += 1
+
+
+async def run(name: str, engine: AsyncEngine, maker: sessionmaker):
+    await prepare(engine, maker)
+    counter = [0, 0]
+    per_worker = OPERATIONS // CONCURRENCY
+    start = time.perf_counter()
+    await asyncio.gather(
+        *(worker(maker, per_worker, counter) for _ in range(CONCURRENCY))
+    )
+    cost = time.perf_counter() - start
+    print(
+        f'{name}: {sum(counter) / cost:>8.0f} 次/秒 '
+        f'(读 {counter[0]}, 写 {counter[1]}, 耗时 {cost:.2f}s)'
+    )
+
+
+def profile_session(write: AsyncEngine, read: AsyncEngine) -> Type[Session]:
+    class BenchSession(RoutingSession):
+        write_engine = write.sync_engine
+        read_engine = read.sync_engine
+
+    return BenchSession
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f'sqlite+aiosqlite:///{Path(tmp) / "before.db"}'
+        engine = create_async_engine(url)
+        maker = sessionmaker(
+            engine, expire_on_commit=False, class_=AsyncSession
+        )
+        await run('默认设置', engine, maker)
+        await engine.dispose()
+
+        url = f'sqlite+aiosqlite:///{Path(tmp) / "after.db"}'
+        write = make_engine(url, 1, WRITE_PRAGMAS, 'BEGIN IMMEDIATE')
+        read = make_engine(url, 4, READ_PRAGMAS)
+        maker = sessionmaker(
+            write,
+            expire_on_commit=False,
+            class_=AsyncSession,
+            sync_session_class=profile_session(write, read),
+        )
+        await run('WAL+连接池', write, maker)
+        await write.dispose()
+        await read.dispose()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+'''
+对比 handle_event 中每个命中触发器 deepcopy 与浅拷贝 Event 的内存分配
+
+python gsuid_core/tools/bench_event_view.py
+'''
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+from base64 import b64encode
+from copy import copy, deepcopy
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from gsuid_core.models import Event, Message  # noqa: E402
+
+FILE_SIZE = [1, 4, 16]
+TRIGGER_NUM = 5
+
+
+def make_event(size_mb: int) -> Event:
+    payload = b64encode(b'\0' * size_mb * 1024 * 1024).decode()
+    return Event(
+        raw_text='',
+        file_name='gacha_log.json',
+        file=payload,
+        file_type='base64',
+        content=[Message('file', f'gacha_log.json|{payload}')],
+        image_list=[f'base64://{payload}'],
+    )
+
+
+def measure(event: Event, copy_func: Callable):
+    tracemalloc.start()
+    start = time.perf_counter()
+    views = []
+    for i in range(TRIGGER_NUM):
+        view = copy_func(event)
+        view.command = str(i)
+        view.text = str(i)
+        views.append(view)
+    cost = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, cost
+
+
+def main():
+    print(f'每条消息命中 {TRIGGER_NUM} 个触发器')
+    for size_mb in FILE_SIZE:
+        event = make_event(size_mb)
+        for name, func in (('deepcopy', deepcopy), ('copy', copy)):
+            peak, cost = measure(event, func)
+            print(
+                f'{size_mb:>3}MB {name:>8}: '
+                f'峰值分配 {peak / 1024:8.2f}KB, '
+                f'耗时 {cost * 1000:8.3f}ms'
+            )
+
+
+if __name__ == '__main__':
+    main()
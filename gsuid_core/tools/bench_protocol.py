@@ -0,0 +1,53 @@
+'''
+对比 json 与 msgpack 两种连接协议发送图片消息时的帧大小与编解码吞吐
+
+python gsuid_core/tools/bench_protocol.py
+'''
+import os
+import sys
+import time
+from pathlib import Path
+
+from msgspec import msgpack
+from msgspec import json as msgjson
+
+sys.path.append(str(Path(__file__).resolve().parents[2]))
+from gsuid_core.models import MessageSend  # noqa: E402
+from gsuid_core.segment import MessageSegment, encode_content  # noqa: E402
+
+IMAGE_SIZE = [50, 500, 2000]
+ROUNDS = 200
+
+
+def bench(size_kb: int, is_binary: bool):
+    content = [MessageSegment.image(os.urandom(size_kb * 1024))]
+    encode = msgpack.encode if is_binary else msgjson.encode
+    decode = msgpack.decode if is_binary else msgjson.decode
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        frame = encode(MessageSend(content=encode_content(content, is_binary)))
+    encode_cost = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        decode(frame, type=MessageSend)
+    decode_cost = time.perf_counter() - start
+
+    return len(frame), encode_cost, decode_cost
+
+
+def main():
+    for size_kb in IMAGE_SIZE:
+        for protocol, is_binary in (('json', False), ('msgpack', True)):
+            frame_size, encode_cost, decode_cost = bench(size_kb, is_binary)
+            print(
+                f'{size_kb:>5}KB {protocol:>7}: '
+                f'帧大小 {frame_size / 1024:9.1f}KB, '
+                f'编码 {ROUNDS / encode_cost:9.1f} 条/s, '
+                f'解码 {ROUNDS / decode_cost:9.1f} 条/s'
+            )
+
+
+if __name__ == '__main__':
+    main()
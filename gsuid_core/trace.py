@@ -0,0 +1,246 @@
+import time
+import atexit
+import asyncio
+import datetime
+import threading
+from uuid import uuid4
+from functools import wraps
+from itertools import count
+from contextvars import ContextVar
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Callable, Iterator, Optional, Coroutine
+
+from msgspec import json as msgjson
+
+from gsuid_core.config import core_config
+from gsuid_core.data_store import get_res_path
+
+trace_config = core_config.get_config('trace')
+TRACE_ENABLE: bool = trace_config.get('enable', True)
+TRACE_BUFFER_SIZE: int = trace_config.get('buffer_size', 200)
+TRACE_FILE: bool = trace_config.get('file', False)
+TRACE_FILE_RETENTION: int = trace_config.get('file_retention', 7)
+TRACE_PATH = get_res_path(['logs', 'trace'])
+# 写入文件的时间间隔与条数上限
+FLUSH_INTERVAL = 1
+FLUSH_SIZE = 100
+
+
+class Trace:
+    '''一次请求从收到帧到回复发出的全部span'''
+
+    __slots__ = ('trace_id', 'name', 'attrs', 'start_at', 'start', 'end')
+
+    def __init__(self, name: str, attrs: Dict[str, Any]):
+        self.trace_id = uuid4().hex[:16]
+        self.name = name
+        self.attrs = attrs
+        self.start_at = time.time()
+        self.start = time.perf_counter()
+        self.end = self.start
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class Span:
+    __slots__ = (
+        'trace',
+        'span_id',
+        'parent_id',
+        'name',
+        'attrs',
+        'start',
+        'duration',
+    )
+
+    def __init__(
+        self,
+        trace: Trace,
+        span_id: int,
+        parent_id: Optional[int],
+        name: str,
+        attrs: Dict[str, Any],
+    ):
+        self.trace = trace
+        self.span_id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.duration = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'offset': round((self.start - self.trace.start) * 1000, 3),
+            'duration': round(self.duration * 1000, 3),
+            'attrs': self.attrs,
+        }
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar(
+    'current_span', default=None
+)
+
+
+def _remove_expired(today: datetime.date):
+    expire = str(today - datetime.timedelta(days=TRACE_FILE_RETENTION))
+    for path in TRACE_PATH.glob('*.jsonl'):
+        # 文件名为日期, 可以直接按字符串比较
+        if path.stem < expire:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def _append(lines: List[bytes]):
+    today = datetime.date.today()
+    path = TRACE_PATH / f'{today}.jsonl'
+    with tracer.file_lock:
+        if tracer.file_date != today:
+            tracer.file_date = today
+            _remove_expired(today)
+        with open(path, 'ab') as fp:
+            fp.write(b'\n'.join(lines) + b'\n')
+
+
+class Tracer:
+    '''
+    轻量的链路追踪, 通过contextvars在协程间传递当前span
+
+    websocket_endpoint收到帧时开启trace, 之后各环节的`span`挂在其下;
+    不在trace中时`span`几乎没有开销
+
+    最近的trace保存在环形缓冲区中, 开启`file`后结束的span按行写入
+    `logs/trace`, 每天一个文件, 保留`file_retention`天
+    '''
+
+    def __init__(self):
+        self.traces: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self.span_id = count(1)
+        self.pending: List[bytes] = []
+        self.last_flush = time.perf_counter()
+        self.file_lock = threading.Lock()
+        # 日期变化时清理过期的文件
+        self.file_date: Optional[datetime.date] = None
+
+    def start_trace(self, name: str, **attrs: Any) -> Optional[Span]:
+        '''开启新的trace, 返回根span, 需要调用`finish`结束'''
+        if not TRACE_ENABLE:
+            return None
+        trace = Trace(name, attrs)
+        self.traces[trace.trace_id] = {'trace': trace, 'spans': []}
+        if len(self.traces) > TRACE_BUFFER_SIZE:
+            self.traces.popitem(last=False)
+        return Span(trace, next(self.span_id), None, name, attrs)
+
+    def finish(self, span: Span):
+        now = time.perf_counter()
+        span.duration = now - span.start
+        trace = span.trace
+        if now > trace.end:
+            trace.end = now
+
+        record = self.traces.get(trace.trace_id)
+        if record is not None:
+            record['spans'].append(span)
+
+        if TRACE_FILE:
+            self.pending.append(msgjson.encode(span.to_dict()))
+            if (
+                len(self.pending) >= FLUSH_SIZE
+                or now - self.last_flush >= FLUSH_INTERVAL
+            ):
+                self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        lines, self.pending = self.pending, []
+        self.last_flush = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            _append(lines)
+        else:
+            loop.run_in_executor(None, _append, lines)
+
+    @contextmanager
+    def use(self, span: Optional[Span]) -> Iterator[Optional[Span]]:
+        '''将span设为当前span, 之后开启的span都挂在其下'''
+        token = current_span.set(span)
+        try:
+            yield span
+        finally:
+            current_span.reset(token)
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Optional[Span]]:
+        parent = current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(
+            parent.trace, next(self.span_id), parent.span_id, name, attrs
+        )
+        token = current_span.set(span)
+        try:
+            yield span
+        finally:
+            current_span.reset(token)
+            self.finish(span)
+
+    async def wrap(self, coro: Coroutine, name: str, **attrs: Any):
+        with self.span(name, **attrs):
+            return await coro
+
+    def slowest(self, limit: int = 50) -> List[Dict[str, Any]]:
+        records = sorted(
+            self.traces.values(),
+            key=lambda r: r['trace'].duration,
+            reverse=True,
+        )
+        result = []
+        for record in records[:limit]:
+            trace: Trace = record['trace']
+            result.append(
+                {
+                    'trace_id': trace.trace_id,
+                    'name': trace.name,
+                    'start_at': datetime.datetime.fromtimestamp(
+                        trace.start_at
+                    ).strftime('%m-%d %H:%M:%S'),
+                    'duration': round(trace.duration * 1000, 3),
+                    **trace.attrs,
+                    'spans': [s.to_dict() for s in record['spans']],
+                }
+            )
+        return result
+
+
+tracer = Tracer()
+atexit.register(tracer.flush)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    '''为异步函数开启span, 默认以函数名命名'''
+
+    def deco(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            with tracer.span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return deco
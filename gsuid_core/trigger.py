@@ -1,7 +1,8 @@
 import re
-from typing import Literal, Callable
+from typing import Match, Literal, Callable, Optional
 
 from gsuid_core.models import Event
+from gsuid_core.metrics import TRIGGER_HITS, TRIGGER_SECONDS
 
 
 class Trigger:
@@ -20,12 +21,18 @@ class Trigger:
         func: Callable,
         block: bool = False,
         to_me: bool = False,
+        sv_name: str = '',
     ):
         self.type = type
         self.keyword = keyword
         self.func = func
         self.block = block
         self.to_me = to_me
+        if self.type == 'regex':
+            self.pattern = re.compile(self.keyword)
+        # 预先取得指标对象, 命中时只需累加
+        self.hits = TRIGGER_HITS.labels(sv_name, f'{type}:{keyword}')
+        self.cost = TRIGGER_SECONDS.labels(sv_name, f'{type}:{keyword}')
 
     def check_command(self, ev: Event) -> bool:
         msg = ev.raw_text
@@ -70,18 +77,46 @@ class Trigger:
         return False
 
     def _check_regex(self, pattern: str, msg: str) -> bool:
-        command_list = re.findall(pattern, msg)
-        if command_list:
+        if self.pattern.search(msg):
             return True
         return False
 
-    async def get_command(self, msg: Event) -> Event:
+    def _iter_match(self, msg: str, match: Optional[Match[str]] = None):
+        if match is None:
+            yield from self.pattern.finditer(msg)
+        elif match.end() == match.start():
+            # 空匹配无法直接续接, 从该位置重新开始
+            yield from self.pattern.finditer(msg, match.start())
+        else:
+            # 首个匹配之前已确定没有匹配, 从首个匹配处继续
+            yield match
+            yield from self.pattern.finditer(msg, match.end())
+
+    async def get_command(
+        self, msg: Event, match: Optional[Match[str]] = None
+    ) -> Event:
         if self.type != 'regex':
             msg.command = self.keyword
             msg.text = msg.raw_text.replace(self.keyword, '')
         else:
-            command_list = re.findall(self.keyword, msg.raw_text)
+            # 单次遍历同时得到 re.findall 与 re.split 的结果
+            raw_text = msg.raw_text
+            groups = self.pattern.groups
+            command_list = []
+            text_list = []
+            last = 0
+            for m in self._iter_match(raw_text, match):
+                if groups == 0:
+                    command_list.append(m.group())
+                elif groups == 1:
+                    command_list.append(m.group(1) or '')
+                else:
+                    command_list.append(m.groups(''))
+                start, end = m.span()
+                text_list.append(raw_text[last:start])
+                text_list.extend(m.groups())
+                last = end
+            text_list.append(raw_text[last:])
             msg.command = '|'.join(command_list)
-            text_list = re.split(self.keyword, msg.raw_text)
             msg.text = '|'.join(text_list)
         return msg
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import re
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Match,
+    Tuple,
+    Pattern,
+    Optional,
+)
+
+from gsuid_core.models import Event
+from gsuid_core.trigger import Trigger
+
+if TYPE_CHECKING:
+    from gsuid_core.sv import SV
+
+# 字典树中保存终止节点触发器的键, 不会与单个字符冲突
+_END = ''
+
+TriggerEntry = Tuple['SV', Trigger]
+TriggerMatch = Tuple['SV', Trigger, Optional[Match[str]]]
+
+# 含有反向引用或条件引用的正则, 合并后组序号会错位, 只能单独匹配
+_UNSAFE_REGEX = re.compile(r'\\[1-9]|\\g<|\(\?P=|\(\?\(')
+
+
+class _Trie:
+    '''前缀树, 同时用于前缀(prefix/command)与反向的后缀(suffix)匹配'''
+
+    def __init__(self):
+        self.root: Dict[str, Any] = {}
+
+    def add(self, keyword: str, entry: TriggerEntry):
+        node = self.root
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node.setdefault(_END, []).append(entry)
+
+    def search(self, msg: str, result: List[TriggerEntry]):
+        # msg本身是否被完整消费, 用于区分prefix与fullmatch
+        length = len(msg)
+        node = self.root
+        depth = 0
+        while True:
+            if _END in node:
+                for entry in node[_END]:
+                    # prefix/suffix 不允许与消息完全相同
+                    if entry[1].type == 'command' or depth < length:
+                        result.append(entry)
+            if depth >= length:
+                break
+            node = node.get(msg[depth])
+            if node is None:
+                break
+            depth += 1
+
+
+class _KeywordAutomaton:
+    '''Aho-Corasick 多模式匹配自动机, 用于keyword触发器'''
+
+    def __init__(self):
+        self.keywords: List[Tuple[str, TriggerEntry]] = []
+        self.is_built = True
+        self.goto: List[Dict[str, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[List[TriggerEntry]] = [[]]
+
+    def add(self, keyword: str, entry: TriggerEntry):
+        self.keywords.append((keyword, entry))
+        self.is_built = False
+
+    def build(self):
+        goto: List[Dict[str, int]] = [{}]
+        output: List[List[TriggerEntry]] = [[]]
+        for keyword, entry in self.keywords:
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    output.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state].append(entry)
+
+        fail = [0] * len(goto)
+        queue = list(goto[0].values())
+        for state in queue:
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                f = fail[state]
+                while f and char not in goto[f]:
+                    f = fail[f]
+                fail[next_state] = goto[f].get(char, 0)
+                output[next_state] = (
+                    output[next_state] + output[fail[next_state]]
+                )
+
+        self.goto = goto
+        self.fail = fail
+        self.output = output
+        self.is_built = True
+
+    def search(self, msg: str, result: List[TriggerEntry]):
+        if not self.is_built:
+            self.build()
+
+        goto = self.goto
+        fail = self.fail
+        output = self.output
+
+        # 空关键词永远命中
+        found: Dict[int, TriggerEntry] = {id(e[1]): e for e in output[0]}
+        state = 0
+        for char in msg:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for entry in output[state]:
+                found[id(entry[1])] = entry
+        result.extend(found.values())
+
+
+class _RegexAutomaton:
+    '''
+    将正则触发器合并为一个由具名零宽断言组成的正则
+
+    对消息进行一次扫描即可得到所有命中的正则触发器及其首个匹配位置
+    '''
+
+    def __init__(self):
+        self.entries: List[TriggerEntry] = []
+        self.is_built = True
+        self.combined: Optional[Pattern[str]] = None
+        self.combined_entries: Dict[str, TriggerEntry] = {}
+        self.single_entries: List[TriggerEntry] = []
+
+    def add(self, entry: TriggerEntry):
+        self.entries.append(entry)
+        self.is_built = False
+
+    def build(self):
+        combined_entries: Dict[str, TriggerEntry] = {}
+        single_entries: List[TriggerEntry] = []
+        alternatives: List[str] = []
+        parts: List[str] = []
+        for index, entry in enumerate(self.entries):
+            pattern = entry[1].pattern
+            if (
+                pattern.flags & ~re.UNICODE
+                or pattern.groupindex
+                or _UNSAFE_REGEX.search(pattern.pattern)
+            ):
+                single_entries.append(entry)
+                continue
+            name = f'_tr{index}'
+            combined_entries[name] = entry
+            alternatives.append(f'(?:{pattern.pattern})')
+            parts.append(f'(?:(?=(?P<{name}>{pattern.pattern}))|)')
+
+        combined = None
+        if parts:
+            # 前置的断言使扫描只停留在至少命中一个正则的位置上
+            prefilter = '|'.join(alternatives)
+            try:
+                combined = re.compile(f'(?={prefilter})' + ''.join(parts))
+            except re.error:
+                single_entries = self.entries[:]
+                combined_entries = {}
+
+        self.combined = combined if combined_entries else None
+        self.combined_entries = combined_entries
+        self.single_entries = single_entries
+        self.is_built = True
+
+    def search(self, msg: str, matches: Dict[int, Match[str]]):
+        if not self.is_built:
+            self.build()
+
+        if self.combined is not None:
+            remain = set(self.combined_entries)
+            for m in self.combined.finditer(msg):
+                for name in [n for n in remain if m.start(n) >= 0]:
+                    remain.discard(name)
+                    trigger = self.combined_entries[name][1]
+                    _m = trigger.pattern.match(msg, m.start(name))
+                    if _m is not None:
+                        matches[id(trigger)] = _m
+                if not remain:
+                    break
+
+        for entry in self.single_entries:
+            _m = entry[1].pattern.search(msg)
+            if _m is not None:
+                matches[id(entry[1])] = _m
+
+
+class TriggerIndex:
+    '''
+    预编译的触发器索引, 由`SV._on`注册时维护
+
+    单次查找的耗时与消息长度相关, 而与已注册的触发器数量无关
+    '''
+
+    def __init__(self):
+        self.fullmatch: Dict[str, List[TriggerEntry]] = {}
+        self.prefix = _Trie()
+        self.suffix = _Trie()
+        self.keyword = _KeywordAutomaton()
+        self.file: Dict[str, List[TriggerEntry]] = {}
+        self.regex = _RegexAutomaton()
+        # 保持与SL.lst一致的SV顺序, 用于同优先级时的排序
+        self.sv_order: Dict[str, int] = {}
+        self.seq: Dict[int, int] = {}
+
+    def add_sv(self, sv: SV):
+        if sv.name not in self.sv_order:
+            self.sv_order[sv.name] = len(self.sv_order)
+
+    def add(self, sv: SV, trigger: Trigger):
+        self.add_sv(sv)
+        entry: TriggerEntry = (sv, trigger)
+        self.seq[id(trigger)] = len(self.seq)
+
+        if trigger.type == 'fullmatch':
+            self.fullmatch.setdefault(trigger.keyword, []).append(entry)
+        elif trigger.type in ('prefix', 'command'):
+            self.prefix.add(trigger.keyword, entry)
+        elif trigger.type == 'suffix':
+            self.suffix.add(trigger.keyword[::-1], entry)
+        elif trigger.type == 'keyword':
+            self.keyword.add(trigger.keyword, entry)
+        elif trigger.type == 'file':
+            self.file.setdefault(trigger.keyword, []).append(entry)
+        else:
+            self.regex.add(entry)
+
+    def _sort_key(self, entry: TriggerEntry) -> Tuple[int, int, int]:
+        sv, trigger = entry
+        return (sv.priority, self.sv_order[sv.name], self.seq[id(trigger)])
+
+    def lookup(self, ev: Event) -> List[TriggerMatch]:
+        '''
+        返回该事件命中的全部触发器, 已按SV优先级排序
+
+        正则触发器会附带检查阶段得到的首个匹配, 其余为`None`
+        '''
+        msg = ev.raw_text
+        result: List[TriggerEntry] = []
+
+        if msg in self.fullmatch:
+            result.extend(self.fullmatch[msg])
+        self.prefix.search(msg, result)
+        self.suffix.search(msg[::-1], result)
+        self.keyword.search(msg, result)
+
+        if ev.file and ev.file_name:
+            file_type = ev.file_name.split('.')[-1]
+            if file_type in self.file:
+                result.extend(self.file[file_type])
+
+        matches: Dict[int, Match[str]] = {}
+        if self.regex.entries:
+            self.regex.search(msg, matches)
+            result.extend(
+                entry
+                for entry in self.regex.entries
+                if id(entry[1]) in matches
+            )
+
+        if not ev.is_tome:
+            result = [entry for entry in result if not entry[1].to_me]
+
+        result.sort(key=self._sort_key)
+        return [(sv, tr, matches.get(id(tr))) for sv, tr in result]
+
+
+trigger_index = TriggerIndex()
@@ -13,7 +13,9 @@ from typing import Any, Dict, List, Tuple, Union, Literal, Optional, cast
 
 from aiohttp import TCPConnector, ClientSession, ContentTypeError
 
+from gsuid_core.trace import traced
 from gsuid_core.logger import logger
+from gsuid_core.metrics import MYS_REQUESTS
 from gsuid_core.utils.database.api import DBSqla
 from gsuid_core.utils.plugins_config.gs_config import core_plugins_config
 
@@ -54,8 +56,8 @@ from .models import (
     LoginTicketInfo,
 )
 
-proxy_url = core_plugins_config.get_config('proxy').data
-ssl_verify = core_plugins_config.get_config('MhySSLVerify').data
+proxy_config = core_plugins_config.handle('proxy')
+ssl_verify = core_plugins_config.handle('MhySSLVerify')
 RECOGNIZE_SERVER = {
     '1': 'cn_gf01',
     '2': 'cn_gf01',
@@ -68,7 +70,7 @@ RECOGNIZE_SERVER = {
 
 
 class BaseMysApi:
-    proxy_url: Optional[str] = proxy_url if proxy_url else None
+    proxy_url: Optional[str] = proxy_config.value or None
     mysVersion = '2.44.1'
     _HEADER = {
         'x-rpc-app_version': mysVersion,
@@ -242,6 +244,7 @@ class BaseMysApi:
         )
         return data
 
+    @traced('mys_request')
     async def _mys_request(
         self,
         url: str,
@@ -252,7 +255,7 @@ class BaseMysApi:
         use_proxy: Optional[bool] = False,
     ) -> Union[Dict, int]:
         async with ClientSession(
-            connector=TCPConnector(verify_ssl=ssl_verify)
+            connector=TCPConnector(verify_ssl=ssl_verify.value)
         ) as client:
             raw_data = {}
             uid = None
@@ -312,6 +315,7 @@ class BaseMysApi:
                         retcode: int = raw_data['code']
                     else:
                         retcode = 0
+                    MYS_REQUESTS.labels(str(retcode)).inc()
 
                     # 针对1034做特殊处理
                     if retcode == 1034:
@@ -355,7 +359,7 @@ class BaseMysApi:
         import inspect
 
         async with ClientSession(
-            connector=TCPConnector(verify_ssl=ssl_verify)
+            connector=TCPConnector(verify_ssl=ssl_verify.value)
         ) as client:
             if 'Cookie' in header:
                 if header['Cookie'] in self.chs:
@@ -439,6 +443,11 @@ class BaseMysApi:
     '''
 
 
+@proxy_config.subscribe
+def _update_proxy(value: str):
+    BaseMysApi.proxy_url = value or None
+
+
 class MysApi(BaseMysApi):
     async def _pass(
         self, gt: str, ch: str, header: Dict
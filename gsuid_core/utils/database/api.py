@@ -1,15 +1,10 @@
 import re
-import asyncio
 from typing import Dict, Type, Tuple, Union, Optional, overload
 
-from sqlalchemy import event
-
 from gsuid_core.bot import Bot
 from gsuid_core.models import Event
 from gsuid_core.utils.database.dal import SQLA
-from gsuid_core.utils.database.base_models import Bind, engine
-
-is_wal = False
+from gsuid_core.utils.database.base_models import Bind, unit_of_work
 
 active_sqla: Dict[str, SQLA] = {}
 active_sr_sqla: Dict[str, SQLA] = {}
@@ -19,10 +14,12 @@ class DBSqla:
     def __init__(self, is_sr: bool = False) -> None:
         self.is_sr = is_sr
 
+    def unit_of_work(self):
+        '''同`SQLA.unit_of_work`'''
+        return unit_of_work()
+
     def get_sqla(self, bot_id) -> SQLA:
-        sqla = self._get_sqla(bot_id, self.is_sr)
-        asyncio.create_task(sqla.sr_adapter())
-        return sqla
+        return self._get_sqla(bot_id, self.is_sr)
 
     def _get_sqla(self, bot_id, is_sr: bool = False) -> SQLA:
         sqla_list = active_sr_sqla if is_sr else active_sqla
@@ -31,13 +28,6 @@ class DBSqla:
             sqla_list[bot_id] = sqla
             sqla.create_all()
 
-            @event.listens_for(engine.sync_engine, "connect")
-            def set_sqlite_pragma(dbapi_connection, connection_record):
-                if is_wal:
-                    cursor = dbapi_connection.cursor()
-                    cursor.execute("PRAGMA journal_mode=WAL")
-                    cursor.close()
-
         return sqla_list[bot_id]
 
     def get_gs_sqla(self, bot_id):
@@ -1,4 +1,9 @@
+import time
+import asyncio
+import inspect
 from functools import wraps
+from contextvars import ContextVar
+from contextlib import asynccontextmanager
 from typing_extensions import ParamSpec, Concatenate
 from typing import (
     Any,
@@ -9,16 +14,28 @@ from typing import (
     Callable,
     Optional,
     Awaitable,
+    AsyncIterator,
+    AsyncContextManager,
 )
 
+from sqlalchemy.sql import Select
+from sqlalchemy.engine import Engine
 from sqlalchemy.future import select
-from sqlalchemy.orm import sessionmaker
 from sqlmodel import Field, SQLModel, col
 from sqlalchemy.sql.expression import func
-from sqlalchemy import and_, delete, update
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import and_, event, delete, update
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    create_async_engine,
+)
 
+from gsuid_core.trace import tracer
+from gsuid_core.config import core_config
 from gsuid_core.data_store import get_res_path
+from gsuid_core.metrics import DB_QUERY_SECONDS
 
 T_BaseModel = TypeVar('T_BaseModel', bound='BaseModel')
 T_BaseIDModel = TypeVar('T_BaseIDModel', bound='BaseIDModel')
@@ -26,19 +43,275 @@ T_User = TypeVar('T_User', bound='User')
 P = ParamSpec("P")
 R = TypeVar("R")
 
+db_config = core_config.get_config('database')
+DB_WAL: bool = db_config.get('wal', True)
+DB_SYNCHRONOUS: str = db_config.get('synchronous', 'NORMAL')
+DB_MMAP_SIZE: int = db_config.get('mmap_size', 268435456)
+DB_CACHE_SIZE: int = db_config.get('cache_size', -65536)
+DB_BUSY_TIMEOUT: int = db_config.get('busy_timeout', 5000)
+DB_TEMP_STORE: str = db_config.get('temp_store', 'MEMORY')
+READ_POOL_SIZE: int = db_config.get('read_pool_size', 4)
+
+COMMON_PRAGMAS = [
+    f'mmap_size={DB_MMAP_SIZE}',
+    f'cache_size={DB_CACHE_SIZE}',
+    f'busy_timeout={DB_BUSY_TIMEOUT}',
+    f'temp_store={DB_TEMP_STORE}',
+]
+WRITE_PRAGMAS = [
+    *(['journal_mode=WAL'] if DB_WAL else []),
+    f'synchronous={DB_SYNCHRONOUS}',
+    *COMMON_PRAGMAS,
+]
+READ_PRAGMAS = [*COMMON_PRAGMAS, 'query_only=ON']
+
 db_url = str(get_res_path().parent / 'GsData.db')
 url = f'sqlite+aiosqlite:///{db_url}'
-engine = create_async_engine(url, pool_recycle=1500)
-async_maker = sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
+
+
+def _before_execute(conn, cursor, statement, parameters, context, many):
+    context._query_start = time.perf_counter()
+
+
+def _after_execute(conn, cursor, statement, parameters, context, many):
+    operation = statement.lstrip()[:6].upper()
+    DB_QUERY_SECONDS.labels(operation).observe(
+        time.perf_counter() - context._query_start
+    )
+
+
+def make_engine(
+    url: str, pool_size: int, pragmas: List[str], begin: str = ''
+) -> AsyncEngine:
+    '''
+    连接池固定为pool_size个连接, 每个连接建立时执行一次pragmas
+
+    aiosqlite默认不复用连接(NullPool), 每个会话都要新开连接与线程;
+    指定begin时由自身显式开启事务, 否则驱动不会为查询与DDL开启事务
+    '''
+    _engine = create_async_engine(
+        url,
+        poolclass=AsyncAdaptedQueuePool,
+        pool_size=pool_size,
+        max_overflow=0,
+        pool_recycle=1500,
+    )
+
+    @event.listens_for(_engine.sync_engine, 'connect')
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(f'PRAGMA {pragma}')
+        cursor.close()
+        if begin:
+            dbapi_connection.isolation_level = None
+
+    if begin:
+
+        @event.listens_for(_engine.sync_engine, 'begin')
+        def _begin(conn):
+            conn.exec_driver_sql(begin)
+
+    event.listen(_engine.sync_engine, 'before_cursor_execute', _before_execute)
+    event.listen(_engine.sync_engine, 'after_cursor_execute', _after_execute)
+    return _engine
+
+
+# 所有写入经由唯一的写连接串行执行, 读取使用只读连接池并行执行
+# 写事务开始时即取得写锁, 其中先读后写的操作不会与其他连接交错
+engine = make_engine(url, 1, WRITE_PRAGMAS, 'BEGIN IMMEDIATE')
+read_engine = (
+    make_engine(url, READ_POOL_SIZE, READ_PRAGMAS)
+    if DB_WAL and READ_POOL_SIZE > 0
+    else engine
+)
+
+
+class RoutingSession(Session):
+    '''
+    查询使用只读连接, 写入(flush/增删改/原生SQL)使用写连接
+
+    会话一旦写入, 之后的查询也使用写连接, 以读到本事务中尚未提交的修改
+    '''
+
+    write_engine: Engine = engine.sync_engine
+    read_engine: Engine = read_engine.sync_engine
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._writing or self._flushing or not isinstance(clause, Select):
+            self.use_writer()
+            return self.write_engine
+        return self.read_engine
+
+    def use_writer(self):
+        '''之后的查询也使用写连接, 与写入处于同一事务'''
+        if not self._writing:
+            self._check_writer()
+            self._writing = True
+
+    def _check_writer(self):
+        '''外层unit_of_work已占用写连接时, 另开的会话写入只会等到超时'''
+        scope = current_scope.get()
+        if scope is None or scope.closed:
+            return
+        outer = scope.session.sync_session
+        if outer is not self and getattr(outer, '_writing', False):
+            raise RuntimeError(
+                '写连接已被外层的unit_of_work占用, '
+                '请在其中使用with_session方法或unit_of_work, 不要另开会话'
+            )
+
+
+async_maker = sessionmaker(
+    engine,
+    expire_on_commit=False,
+    class_=AsyncSession,
+    sync_session_class=RoutingSession,
+)
+
+
+async def dispose_engines():
+    '''关闭连接池中的连接, aiosqlite的连接线程不会随进程自动退出'''
+    await engine.dispose()
+    if read_engine is not engine:
+        await read_engine.dispose()
+
+
+class SessionScope:
+    '''
+    unit_of_work中共享的会话
+
+    其中的`commit`只会flush, 由最外层的unit_of_work统一提交,
+    其余属性与方法直接转发给AsyncSession
+
+    其中创建的子任务(gather/create_task)同样加入该会话:
+    写连接只有一个, 子任务另开会话写入时会一直等待外层归还连接
+
+    会话不能并发使用, 每次异步操作都通过`op_lock`依次执行;
+    with_session方法与嵌套的unit_of_work通过`hold`独占会话,
+    其中创建的子任务继承独占, 不会等待外层释放
+    '''
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.lock = asyncio.Lock()
+        self.op_lock = asyncio.Lock()
+        self.closed = False
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.session, name)
+        if not inspect.iscoroutinefunction(attr):
+            return attr
+
+        @wraps(attr)
+        async def locked(*args, **kwargs):
+            async with self.hold(), self.op_lock:
+                return await attr(*args, **kwargs)
+
+        return locked
+
+    async def commit(self):
+        async with self.hold(), self.op_lock:
+            await self.session.flush()
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[None]:
+        '''独占会话, 可以重入, 其中创建的子任务也视为持有'''
+        if current_hold.get() is self:
+            yield
+            return
+        async with self.lock:
+            token = current_hold.set(self)
+            try:
+                yield
+            finally:
+                current_hold.reset(token)
+
+
+current_scope: ContextVar[Optional[SessionScope]] = ContextVar(
+    'current_scope', default=None
+)
+# 当前上下文独占的会话, 由其中创建的子任务继承
+current_hold: ContextVar[Optional[SessionScope]] = ContextVar(
+    'current_hold', default=None
+)
+
+
+def _get_scope() -> Optional[SessionScope]:
+    scope = current_scope.get()
+    # 子任务可能在外层提交之后才执行到这里
+    if scope is not None and not scope.closed:
+        return scope
+    return None
+
+
+@asynccontextmanager
+async def _scope(write: bool) -> AsyncIterator[SessionScope]:
+    scope = _get_scope()
+    if scope is not None:
+        async with scope.hold():
+            if write:
+                scope.session.sync_session.use_writer()
+            yield scope
+        return
+
+    async with async_maker() as session:
+        scope = SessionScope(session)
+        if write:
+            session.sync_session.use_writer()
+        token = current_scope.set(scope)
+        try:
+            yield scope
+            async with scope.hold(), scope.op_lock:
+                await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
+        finally:
+            scope.closed = True
+            current_scope.reset(token)
+
+
+def unit_of_work() -> AsyncContextManager[AsyncSession]:
+    '''
+    其中的数据库操作共用一个会话与事务, 正常退出时提交, 出错时回滚
+
+    查询同样使用写连接, 事务以BEGIN IMMEDIATE开启, 先读后写的操作
+    不会与其他写入交错; 嵌套使用或在其中的子任务中使用时,
+    加入外层的事务并在期间独占会话
+    '''
+    return _scope(True)  # type: ignore
 
 
 def with_session(
     func: Callable[Concatenate[Any, AsyncSession, P], Awaitable[R]]
 ) -> Callable[Concatenate[Any, P], Awaitable[R]]:
+    '''在当前的unit_of_work中执行, 不在其中时单独开启会话, 查询使用只读连接'''
+
     @wraps(func)
     async def wrapper(self, *args: P.args, **kwargs: P.kwargs):
-        async with async_maker() as session:
-            return await func(self, session, *args, **kwargs)
+        with tracer.span(f'db.{func.__name__}'):
+            async with _scope(False) as session:
+                return await func(
+                    self, session, *args, **kwargs  # type: ignore
+                )
+
+    return wrapper
+
+
+def in_unit_of_work(
+    func: Callable[P, Awaitable[R]]
+) -> Callable[P, Awaitable[R]]:
+    '''由多个数据库操作组成的方法, 其中的调用共用一个会话与事务'''
+
+    @wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> R:
+        async with unit_of_work():
+            return await func(*args, **kwargs)
 
     return wrapper
 
@@ -216,6 +489,7 @@ class Bind(BaseModel):
         return bool(await cls.select_data(user_id, bot_id))
 
     @classmethod
+    @in_unit_of_work
     async def insert_uid(
         cls,
         user_id: str,
@@ -268,6 +542,7 @@ class Bind(BaseModel):
         return 0
 
     @classmethod
+    @in_unit_of_work
     async def delete_uid(
         cls,
         user_id: str,
@@ -311,6 +586,7 @@ class Bind(BaseModel):
         return uid_list
 
     @classmethod
+    @in_unit_of_work
     async def switch_uid_by_game(
         cls,
         user_id: str,
@@ -2,12 +2,10 @@ import re
 import asyncio
 from typing import Dict, List, Literal, Optional
 
-from sqlmodel import SQLModel
-from sqlalchemy.sql import text
-
+from .migrations import migrate
 from .utils import SERVER, SR_SERVER
-from .base_models import engine, async_maker
 from .models import GsBind, GsPush, GsUser, GsCache
+from .base_models import async_maker, unit_of_work, dispose_engines
 
 
 class SQLA:
@@ -15,39 +13,30 @@ class SQLA:
         self.bot_id = bot_id
         self.is_sr = is_sr
 
+    def unit_of_work(self):
+        '''
+        `async with sqla.unit_of_work():`
+
+        其中调用的数据库方法共用一个会话与事务, 全部成功后一并提交
+        '''
+        return unit_of_work()
+
     def create_all(self):
         try:
             asyncio.create_task(self._create_all())
         except RuntimeError:
             loop = asyncio.get_event_loop()
             loop.run_until_complete(self._create_all())
+            # 连接池中的连接不能带到之后的事件循环中
+            loop.run_until_complete(dispose_engines())
             loop.close()
 
     async def _create_all(self):
-        async with engine.begin() as conn:
-            await conn.run_sync(SQLModel.metadata.create_all)
-            await self.sr_adapter()
+        await migrate()
 
     async def sr_adapter(self):
-        exec_list = [
-            'ALTER TABLE GsBind ADD COLUMN group_id TEXT',
-            'ALTER TABLE GsBind ADD COLUMN sr_uid TEXT',
-            'ALTER TABLE GsUser ADD COLUMN sr_uid TEXT',
-            'ALTER TABLE GsUser ADD COLUMN sr_region TEXT',
-            'ALTER TABLE GsUser ADD COLUMN fp TEXT',
-            'ALTER TABLE GsUser ADD COLUMN device_id TEXT',
-            'ALTER TABLE GsUser ADD COLUMN sr_sign_switch TEXT DEFAULT "off"',
-            'ALTER TABLE GsUser ADD COLUMN sr_push_switch TEXT DEFAULT "off"',
-            'ALTER TABLE GsUser ADD COLUMN draw_switch TEXT DEFAULT "off"',
-            'ALTER TABLE GsCache ADD COLUMN sr_uid TEXT',
-        ]
-        async with async_maker() as session:
-            for _t in exec_list:
-                try:
-                    await session.execute(text(_t))
-                    await session.commit()
-                except:  # noqa: E722
-                    pass
+        '''已由`migrate`中的版本化迁移取代, 保留给旧插件调用'''
+        await migrate()
 
     #####################
     # GsBind 部分 #
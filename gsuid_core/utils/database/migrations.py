@@ -0,0 +1,105 @@
+from typing import Dict, List, Tuple, Callable, Awaitable
+
+from sqlmodel import SQLModel
+from sqlalchemy.sql import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from gsuid_core.logger import logger
+
+from .base_models import engine
+from .models import GsBind, GsPush, GsUser, GsCache  # noqa: F401
+
+Migration = Callable[[AsyncConnection], Awaitable[None]]
+
+# 旧版本数据库中可能缺少的列
+LEGACY_COLUMNS: Dict[str, List[Tuple[str, str]]] = {
+    'gsbind': [
+        ('group_id', 'TEXT'),
+        ('sr_uid', 'TEXT'),
+    ],
+    'gsuser': [
+        ('sr_uid', 'TEXT'),
+        ('sr_region', 'TEXT'),
+        ('fp', 'TEXT'),
+        ('device_id', 'TEXT'),
+        ('sr_sign_switch', 'TEXT DEFAULT \'off\''),
+        ('sr_push_switch', 'TEXT DEFAULT \'off\''),
+        ('draw_switch', 'TEXT DEFAULT \'off\''),
+    ],
+    'gscache': [
+        ('sr_uid', 'TEXT'),
+    ],
+}
+
+# 按常用查询条件建立的索引: (索引名, 表名, 列)
+INDEXES: List[Tuple[str, str, Tuple[str, ...]]] = [
+    ('ix_gsbind_user_bot', 'gsbind', ('user_id', 'bot_id')),
+    ('ix_gsuser_user_bot', 'gsuser', ('user_id', 'bot_id')),
+    ('ix_gsuser_uid', 'gsuser', ('uid',)),
+    ('ix_gsuser_sr_uid', 'gsuser', ('sr_uid',)),
+    ('ix_gsuser_cookie', 'gsuser', ('cookie',)),
+    ('ix_gscache_uid', 'gscache', ('uid',)),
+    ('ix_gscache_sr_uid', 'gscache', ('sr_uid',)),
+    ('ix_gscache_cookie', 'gscache', ('cookie',)),
+    ('ix_gspush_uid', 'gspush', ('uid',)),
+]
+
+
+async def _add_legacy_columns(conn: AsyncConnection):
+    for table, columns in LEGACY_COLUMNS.items():
+        result = await conn.execute(text(f'PRAGMA table_info({table})'))
+        exists = {row[1] for row in result}
+        for name, define in columns:
+            if name not in exists:
+                await conn.execute(
+                    text(f'ALTER TABLE {table} ADD COLUMN {name} {define}')
+                )
+
+
+async def _create_indexes(conn: AsyncConnection):
+    for name, table, columns in INDEXES:
+        await conn.execute(
+            text(
+                f'CREATE INDEX IF NOT EXISTS {name} '
+                f'ON {table} ({", ".join(columns)})'
+            )
+        )
+
+
+# 只能在末尾追加, 数据库版本即已执行的迁移数量
+MIGRATIONS: List[Migration] = [
+    _add_legacy_columns,
+    _create_indexes,
+]
+SCHEMA_VERSION = len(MIGRATIONS)
+
+_migrated = False
+
+
+async def migrate():
+    '''
+    建表并执行尚未应用的迁移, 已应用的版本记录在`PRAGMA user_version`
+
+    全部在写连接的同一事务中完成, 失败时整体回滚, 下次启动重试;
+    写连接由自身以BEGIN IMMEDIATE开启事务, 其中的DDL不会被驱动自动提交;
+    每个进程只需执行一次, 之后的调用直接返回
+    '''
+    global _migrated
+    if _migrated:
+        return
+
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+        result = await conn.execute(text('PRAGMA user_version'))
+        version: int = result.scalar() or 0
+        if version > SCHEMA_VERSION:
+            logger.warning(
+                f'[数据库] 数据库版本{version}高于当前支持的{SCHEMA_VERSION}, 跳过迁移'
+            )
+        elif version < SCHEMA_VERSION:
+            for index in range(version, SCHEMA_VERSION):
+                await MIGRATIONS[index](conn)
+            # PRAGMA不支持绑定参数
+            await conn.execute(text(f'PRAGMA user_version = {SCHEMA_VERSION}'))
+            logger.info(f'[数据库] 已迁移至版本{SCHEMA_VERSION}')
+    _migrated = True
@@ -1,4 +1,4 @@
-from io import BytesIO
+import time
 from pathlib import Path
 from base64 import b64encode
 from typing import Union, overload
@@ -6,17 +6,32 @@ from typing import Union, overload
 import aiofiles
 from PIL import Image, ImageDraw, ImageFont
 
+from gsuid_core.trace import traced
 from gsuid_core.utils.fonts.fonts import core_font
+from gsuid_core.metrics import IMAGE_RENDER_SECONDS
+from gsuid_core.utils.image.encoder import IMAGE_FORMAT, image_encoder
 from gsuid_core.utils.image.image_tools import draw_center_text_by_line
 
 
 @overload
-async def convert_img(img: Image.Image, is_base64: bool = False) -> bytes:
+async def convert_img(
+    img: Image.Image,
+    is_base64: bool = False,
+    format: IMAGE_FORMAT = 'JPEG',
+    quality: int = 85,
+    target_size: int = 0,
+) -> bytes:
     ...
 
 
 @overload
-async def convert_img(img: Image.Image, is_base64: bool = True) -> str:
+async def convert_img(
+    img: Image.Image,
+    is_base64: bool = True,
+    format: IMAGE_FORMAT = 'JPEG',
+    quality: int = 85,
+    target_size: int = 0,
+) -> str:
     ...
 
 
@@ -30,8 +45,13 @@ async def convert_img(img: Path, is_base64: bool = False) -> str:
     ...
 
 
+@traced('convert_img')
 async def convert_img(
-    img: Union[Image.Image, str, Path, bytes], is_base64: bool = False
+    img: Union[Image.Image, str, Path, bytes],
+    is_base64: bool = False,
+    format: IMAGE_FORMAT = 'JPEG',
+    quality: int = 85,
+    target_size: int = 0,
 ):
     """
     :说明:
@@ -39,14 +59,15 @@ async def convert_img(
     :参数:
       * img (Image): 图片。
       * is_base64 (bool): 是否转换为base64格式, 不填默认转为bytes。
+      * format (str): 编码格式, 可选JPEG, WEBP, PNG, PNG8。
+      * quality (int): 有损格式的编码质量。
+      * target_size (int): 目标字节数, 超过时尝试压缩, 0为不限制。
     :返回:
       * res: bytes对象或base64编码图片。
     """
     if isinstance(img, Image.Image):
-        img = img.convert('RGB')
-        result_buffer = BytesIO()
-        img.save(result_buffer, format='JPEG', quality=85)
-        res = result_buffer.getvalue()
+        # 在线程池中编码, 不阻塞事件循环
+        res = await image_encoder.encode(img, format, quality, target_size)
         if is_base64:
             res = 'base64://' + b64encode(res).decode()
         return res
@@ -118,7 +139,9 @@ def get_height(content: str, size: int) -> int:
     return (line_count + 1) * size
 
 
+@traced('text2pic')
 async def text2pic(text: str, max_size: int = 600, font_size: int = 24):
+    start = time.perf_counter()
     if text.endswith('\n'):
         text = text[:-1]
 
@@ -130,4 +153,5 @@ async def text2pic(text: str, max_size: int = 600, font_size: int = 24):
         img_draw, (50, 0), text, core_font(font_size), 'black', 500, True
     )
     img = img.crop((0, 0, 600, int(y + 30)))
+    IMAGE_RENDER_SECONDS.observe(time.perf_counter() - start)
     return await convert_img(img)
@@ -0,0 +1,170 @@
+import time
+import asyncio
+from io import BytesIO
+from typing import Dict, List, Literal, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from gsuid_core.models import Message
+from gsuid_core.config import core_config
+from gsuid_core.metrics import IMAGE_ENCODE_SECONDS
+
+IMAGE_FORMAT = Literal['JPEG', 'WEBP', 'PNG', 'PNG8']
+
+image_config = core_config.get_config('image')
+IMAGE_WORKERS: int = image_config.get('workers', 4)
+DEFAULT_FORMAT: IMAGE_FORMAT = image_config.get('format', 'PNG')
+DEFAULT_QUALITY: int = image_config.get('quality', 85)
+DEFAULT_TARGET_SIZE: int = image_config.get('target_size', 0)
+
+# 为了满足目标大小, 有损格式的质量最低降到该值
+MIN_QUALITY = 40
+
+
+class PendingImage:
+    '''尚未编码的图片, 由`MessageSegment.image`生成, 在发送时编码'''
+
+    __slots__ = ('img', 'format', 'quality', 'target_size')
+
+    def __init__(
+        self,
+        img: Image.Image,
+        format: Optional[IMAGE_FORMAT] = None,
+        quality: Optional[int] = None,
+        target_size: Optional[int] = None,
+    ):
+        self.img = img
+        self.format = format
+        self.quality = quality
+        self.target_size = target_size
+
+
+def _save(img: Image.Image, format: IMAGE_FORMAT, quality: int) -> bytes:
+    buffer = BytesIO()
+    if format == 'JPEG':
+        img.convert('RGB').save(buffer, format='JPEG', quality=quality)
+    elif format == 'WEBP':
+        if img.mode not in ('RGB', 'RGBA'):
+            img = img.convert('RGBA')
+        img.save(buffer, format='WEBP', quality=quality)
+    elif format == 'PNG8':
+        if img.mode == 'RGBA':
+            # RGBA只能使用FASTOCTREE量化
+            img = img.quantize(256, method=2)
+        else:
+            img = img.convert('RGB').quantize(256)
+        img.save(buffer, format='PNG', optimize=True)
+    else:
+        img.convert('RGB').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def encode_image(
+    img: Image.Image,
+    format: IMAGE_FORMAT,
+    quality: int,
+    target_size: int = 0,
+) -> bytes:
+    '''
+    同步编码图片, 指定了target_size时会尝试将结果压缩到该字节数以内
+
+    有损格式逐步降低质量, PNG则退化为调色板PNG
+    '''
+    data = _save(img, format, quality)
+    if not target_size or len(data) <= target_size:
+        return data
+
+    if format == 'PNG':
+        return _save(img, 'PNG8', quality)
+    elif format in ('JPEG', 'WEBP'):
+        low, high = MIN_QUALITY, quality - 1
+        best = data
+        while low <= high:
+            mid = (low + high) // 2
+            result = _save(img, format, mid)
+            if len(result) <= target_size:
+                best = result
+                low = mid + 1
+            else:
+                if len(result) < len(best):
+                    best = result
+                high = mid - 1
+        return best
+    return data
+
+
+class ImageEncoder:
+    '''
+    在线程池中编码图片, 避免PIL编码阻塞事件循环
+
+    记录排队数量与编码耗时, 可通过`stats`获取
+    '''
+
+    def __init__(self, max_workers: int = IMAGE_WORKERS):
+        self.executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix='gs_image'
+        )
+        self.pending = 0
+        self.encoded = 0
+        self.cost_total = 0.0
+        self.cost_max = 0.0
+
+    async def encode(
+        self,
+        img: Image.Image,
+        format: Optional[IMAGE_FORMAT] = None,
+        quality: Optional[int] = None,
+        target_size: Optional[int] = None,
+    ) -> bytes:
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        self.pending += 1
+        try:
+            return await loop.run_in_executor(
+                self.executor,
+                encode_image,
+                img,
+                format or DEFAULT_FORMAT,
+                quality or DEFAULT_QUALITY,
+                DEFAULT_TARGET_SIZE if target_size is None else target_size,
+            )
+        finally:
+            self.pending -= 1
+            cost = time.perf_counter() - start
+            IMAGE_ENCODE_SECONDS.observe(cost)
+            self.encoded += 1
+            self.cost_total += cost
+            if cost > self.cost_max:
+                self.cost_max = cost
+
+    async def encode_content(self, content: List[Message]) -> List[Message]:
+        '''编码消息中所有待编码的图片, 不修改传入的消息'''
+        result: List[Message] = []
+        for msg in content:
+            if msg.type == 'image' and isinstance(msg.data, PendingImage):
+                pending = msg.data
+                data = await self.encode(
+                    pending.img,
+                    pending.format,
+                    pending.quality,
+                    pending.target_size,
+                )
+                result.append(Message(type='image', data=data))
+            elif msg.type == 'node' and isinstance(msg.data, list):
+                data = await self.encode_content(msg.data)
+                result.append(Message(type='node', data=data))
+            else:
+                result.append(msg)
+        return result
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            'pending': self.pending,
+            'encoded': self.encoded,
+            'cost_avg': self.cost_total / self.encoded if self.encoded else 0,
+            'cost_max': self.cost_max,
+        }
+
+
+image_encoder = ImageEncoder()
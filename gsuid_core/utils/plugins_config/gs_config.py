@@ -1,10 +1,12 @@
 from pathlib import Path
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Tuple, Union
 
 from msgspec import json as msgjson
 
 from gsuid_core.logger import logger
+from gsuid_core.config import ConfigHandle
 from gsuid_core.data_store import get_res_path
+from gsuid_core.persist import atomic_write, write_behind
 
 from .models import GSC, GsBoolConfig
 from .config_default import CONIFG_DEFAULT
@@ -34,12 +36,12 @@ class StringConfig:
         self.config_list = config_list
 
         if not CONFIG_PATH.exists():
-            with open(CONFIG_PATH, 'wb') as file:
-                file.write(msgjson.encode(config_list))
+            atomic_write(CONFIG_PATH, msgjson.encode(config_list))
 
         self.config_name = config_name
         self.CONFIG_PATH = CONFIG_PATH
         self.config: Dict[str, GSC] = {}
+        self.handles: Dict[str, ConfigHandle] = {}
         self.update_config()
 
     def __len__(self):
@@ -51,9 +53,11 @@ class StringConfig:
     def __getitem__(self, key) -> GSC:
         return self.config[key]
 
+    def _dump(self) -> bytes:
+        return msgjson.format(msgjson.encode(self.config), indent=4)
+
     def write_config(self):
-        with open(self.CONFIG_PATH, 'wb') as file:
-            file.write(msgjson.format(msgjson.encode(self.config), indent=4))
+        write_behind.schedule(self.CONFIG_PATH, self._dump)
 
     def update_config(self):
         # 打开config.json
@@ -75,9 +79,31 @@ class StringConfig:
         for key in delete_keys:
             self.config.pop(key)
 
+        for key, handle in self.handles.items():
+            if key in self.config:
+                handle.refresh(self.config[key].data)
+
         # 重新写回
         self.write_config()
 
+    def reload(self, data: bytes) -> Tuple[List[str], List[str]]:
+        '''应用配置文件中被修改的项, 返回发生改变的配置项, 插件配置无需重启'''
+        config = msgjson.decode(data, type=Dict[str, GSC])
+        changed = []
+        for key, item in config.items():
+            if key not in self.config or item.data == self.config[key].data:
+                continue
+            if type(item.data) is not type(self.config[key].data):
+                logger.warning(
+                    f'[配置][{self.config_name}] 配置项 {key} 类型不正确, 已忽略...'
+                )
+                continue
+            self.config[key].data = item.data  # type: ignore
+            if key in self.handles:
+                self.handles[key].update(item.data)
+            changed.append(key)
+        return changed, []
+
     def get_config(self, key: str) -> Any:
         if key in self.config:
             return self.config[key]
@@ -93,6 +119,12 @@ class StringConfig:
             )
             return GsBoolConfig('缺省值', '获取错误的配置项', False)
 
+    def handle(self, key: str) -> ConfigHandle[Any]:
+        '''取得配置项数据的引用, `value`随set_config更新'''
+        if key not in self.handles:
+            self.handles[key] = ConfigHandle(key, self.get_config(key).data)
+        return self.handles[key]
+
     def set_config(
         self, key: str, value: Union[str, List, bool, Dict]
     ) -> bool:
@@ -101,6 +133,8 @@ class StringConfig:
             if type(value) == type(temp):
                 # 设置值
                 self.config[key].data = value  # type: ignore
+                if key in self.handles:
+                    self.handles[key].update(value)
                 # 重新写回
                 self.write_config()
                 return True
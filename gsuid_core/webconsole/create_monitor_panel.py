@@ -0,0 +1,41 @@
+def get_monitor_panel():
+    return {
+        'type': 'page',
+        'title': '事件循环监控',
+        'remark': '记录阻塞事件循环超过阈值的调用, 展开可查看阻塞时的调用栈',
+        'body': [
+            {
+                'type': 'crud',
+                'api': 'get:/genshinuid/api/getLoopStatus',
+                'syncLocation': False,
+                'interval': 5000,
+                'headerToolbar': [
+                    {
+                        'type': 'tpl',
+                        'tpl': '当前延迟 ${lag_last}ms, 最大延迟 ${lag_max}ms, '
+                        '阈值 ${threshold}ms, 共阻塞 ${blocks} 次',
+                    }
+                ],
+                'columns': [
+                    {'name': 'time', 'label': '时间'},
+                    {'name': 'lag', 'label': '阻塞(ms)'},
+                    {'name': 'plugin', 'label': '插件'},
+                    {'name': 'task', 'label': '任务'},
+                    {'name': 'samples', 'label': '采样数'},
+                ],
+                'itemAction': {
+                    'type': 'button',
+                    'actionType': 'dialog',
+                    'dialog': {
+                        'title': '${plugin} 阻塞 ${lag}ms',
+                        'size': 'lg',
+                        'body': {
+                            'type': 'code',
+                            'language': 'python',
+                            'value': '${stack}',
+                        },
+                    },
+                },
+            }
+        ],
+    }
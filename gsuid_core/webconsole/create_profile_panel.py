@@ -0,0 +1,83 @@
+def get_profile_panel():
+    return {
+        'type': 'page',
+        'title': '性能采样',
+        'remark': '对选中的服务或触发器采样一段时间, 下载折叠栈文件后可用flamegraph.pl或speedscope查看',
+        'body': [
+            {
+                'type': 'form',
+                'title': '开始采样',
+                'api': 'post:/genshinuid/api/startProfile',
+                'submitText': '开始',
+                'body': [
+                    {
+                        'type': 'select',
+                        'name': 'sv',
+                        'label': '服务',
+                        'searchable': True,
+                        'required': True,
+                        'source': 'get:/genshinuid/api/getProfileStatus',
+                    },
+                    {
+                        'type': 'input-text',
+                        'name': 'trigger',
+                        'label': '触发器',
+                        'placeholder': '留空则采样该服务下的全部触发器',
+                    },
+                    {
+                        'type': 'input-number',
+                        'name': 'seconds',
+                        'label': '时长(秒)',
+                        'value': 30,
+                        'min': 1,
+                        'max': 600,
+                    },
+                ],
+            },
+            {
+                'type': 'service',
+                'api': 'get:/genshinuid/api/getProfileStatus',
+                'interval': 3000,
+                'body': [
+                    {
+                        'type': 'property',
+                        'title': '当前采样',
+                        'items': [
+                            {'label': '服务', 'content': '${sv}'},
+                            {'label': '触发器', 'content': '${trigger}'},
+                            {'label': '进行中', 'content': '${active}'},
+                            {'label': '剩余(秒)', 'content': '${remaining}'},
+                            {'label': '调用次数', 'content': '${calls}'},
+                            {'label': '采样次数', 'content': '${samples}'},
+                        ],
+                    },
+                    {
+                        'type': 'button-toolbar',
+                        'className': 'm-t',
+                        'buttons': [
+                            {
+                                'type': 'button',
+                                'label': '停止',
+                                'actionType': 'ajax',
+                                'api': 'post:/genshinuid/api/stopProfile',
+                            },
+                            {
+                                'type': 'button',
+                                'label': '下载墙钟时间',
+                                'actionType': 'download',
+                                'api': 'get:/genshinuid/api/downloadProfile'
+                                '?kind=wall',
+                            },
+                            {
+                                'type': 'button',
+                                'label': '下载CPU时间',
+                                'actionType': 'download',
+                                'api': 'get:/genshinuid/api/downloadProfile'
+                                '?kind=cpu',
+                            },
+                        ],
+                    },
+                ],
+            },
+        ],
+    }
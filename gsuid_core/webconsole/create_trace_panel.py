@@ -0,0 +1,41 @@
+def get_trace_panel():
+    return {
+        'type': 'page',
+        'title': '慢请求追踪',
+        'remark': '最近的请求中耗时最长的若干条, 展开可查看各环节的耗时',
+        'body': [
+            {
+                'type': 'crud',
+                'api': 'get:/genshinuid/api/getSlowTraces',
+                'syncLocation': False,
+                'interval': 10000,
+                'columns': [
+                    {'name': 'start_at', 'label': '时间'},
+                    {'name': 'duration', 'label': '耗时(ms)'},
+                    {'name': 'bot_id', 'label': 'Bot'},
+                    {'name': 'group_id', 'label': '群号'},
+                    {'name': 'user_id', 'label': '用户'},
+                    {'name': 'trace_id', 'label': 'TraceID'},
+                ],
+                'footable': {'expand': 'first'},
+                'itemAction': {
+                    'type': 'button',
+                    'actionType': 'dialog',
+                    'dialog': {
+                        'title': 'Trace ${trace_id}',
+                        'size': 'lg',
+                        'body': {
+                            'type': 'table',
+                            'source': '${spans}',
+                            'columns': [
+                                {'name': 'name', 'label': '环节'},
+                                {'name': 'offset', 'label': '开始(ms)'},
+                                {'name': 'duration', 'label': '耗时(ms)'},
+                                {'name': 'attrs', 'label': '参数'},
+                            ],
+                        },
+                    },
+                },
+            }
+        ],
+    }
@@ -13,8 +13,8 @@ from fastapi_user_auth.site import AuthAdminSite
 from fastapi_amis_admin.models.fields import Field
 from fastapi_amis_admin.admin.settings import Settings
 from fastapi_user_auth.auth.models import UserRoleLink
-from fastapi_amis_admin.utils.translation import i18n as _
 from fastapi import Depends, FastAPI, Request, HTTPException
+from fastapi_amis_admin.utils.translation import i18n as _
 from fastapi_amis_admin.admin.site import FileAdmin, APIDocsApp
 from fastapi_amis_admin.amis.constants import LevelEnum, DisplayModeEnum
 from fastapi_user_auth.admin import (
@@ -44,7 +44,10 @@ from gsuid_core.webconsole.html import gsuid_webconsole_help
 from gsuid_core.webconsole.create_sv_panel import get_sv_page
 from gsuid_core.version import __version__ as GenshinUID_version
 from gsuid_core.webconsole.create_task_panel import get_tasks_panel
+from gsuid_core.webconsole.create_trace_panel import get_trace_panel
 from gsuid_core.webconsole.create_config_panel import get_config_page
+from gsuid_core.webconsole.create_monitor_panel import get_monitor_panel
+from gsuid_core.webconsole.create_profile_panel import get_profile_panel
 from gsuid_core.utils.database.models import GsBind, GsPush, GsUser, GsCache
 from gsuid_core.webconsole.login_page import (  # noqa  # 不要删
     AuthRouter,
@@ -416,5 +419,41 @@ class PluginsManagePage(GsAdminPage):
     page = Page.parse_obj(get_tasks_panel())
 
 
+@site.register_admin
+class TraceManagePage(GsAdminPage):
+    page_schema = PageSchema(
+        label=('慢请求追踪'),
+        icon='fa fa-clock-o',
+        url='/TraceManage',
+        isDefaultPage=True,
+        sort=100,
+    )
+    page = Page.parse_obj(get_trace_panel())
+
+
+@site.register_admin
+class MonitorManagePage(GsAdminPage):
+    page_schema = PageSchema(
+        label=('事件循环监控'),
+        icon='fa fa-heartbeat',
+        url='/MonitorManage',
+        isDefaultPage=True,
+        sort=100,
+    )
+    page = Page.parse_obj(get_monitor_panel())
+
+
+@site.register_admin
+class ProfileManagePage(GsAdminPage):
+    page_schema = PageSchema(
+        label=('性能采样'),
+        icon='fa fa-fire',
+        url='/ProfileManage',
+        isDefaultPage=True,
+        sort=100,
+    )
+    page = Page.parse_obj(get_profile_panel())
+
+
 # 取消注册默认管理类
 site.unregister_admin(admin.HomeAdmin, APIDocsApp, FileAdmin)
@@ -0,0 +1,152 @@
+import asyncio
+from typing import List, Tuple, Union, Optional
+
+from fastapi import WebSocket
+
+from gsuid_core.logger import logger
+from gsuid_core.config import core_config
+from gsuid_core.models import MessageSend
+from gsuid_core.segment import encode_content
+from gsuid_core.media_store import media_store
+from gsuid_core.chunk import Payload, iter_chunks
+from gsuid_core.utils.image.encoder import image_encoder
+from gsuid_core.protocol import PROTOCOL, get_encoder, get_batch_header
+
+ws_config = core_config.get_config('ws')
+SEND_QUEUE_SIZE: int = ws_config.get('send_queue_size', 100)
+BATCH_WINDOW: float = ws_config.get('batch_window', 0.005)
+BATCH_FRAME_SIZE: int = ws_config.get('batch_frame_size', 4096)
+BATCH_MAX_SIZE: int = ws_config.get('batch_max_size', 65536)
+
+Frame = Union[bytes, str]
+
+
+class FrameWriter:
+    '''
+    每个连接唯一的发送协程, 所有发往适配器的帧都经由此处按顺序写出
+
+    队列达到上限时`send_bytes`会等待, 从而对发送方形成背压
+
+    适配器连接时携带`?batch=true`则开启合并,
+    短时间内连续到达的小帧会被合并为一个数组帧发送
+
+    携带`?chunk=true`则开启分片, 超大的图片/语音/文件会先以分片帧发送,
+    随后的消息帧中以`chunk://{id}`引用, 适配器据此重组
+    '''
+
+    def __init__(
+        self,
+        ws: WebSocket,
+        is_batch: bool = False,
+        protocol: PROTOCOL = 'json',
+        is_chunk: bool = False,
+    ):
+        self.ws = ws
+        self.is_batch = is_batch
+        self.is_chunk = is_chunk
+        self.protocol: PROTOCOL = protocol
+        self.is_binary = protocol == 'msgpack'
+        self.encode = get_encoder(protocol)
+        self.queue: 'asyncio.Queue[Frame]' = asyncio.Queue(SEND_QUEUE_SIZE)
+        self.is_closed = False
+
+        self.frames_out = 0
+        self.bytes_out = 0
+        self.batches_out = 0
+
+    async def send(self, msg: MessageSend):
+        chunks: Optional[List[Tuple[str, Payload]]] = (
+            [] if self.is_chunk else None
+        )
+        if msg.content:
+            content = await image_encoder.encode_content(msg.content)
+            # 较大的图片替换为媒体库链接
+            content = await media_store.link_content(content)
+            msg.content = encode_content(content, self.is_binary, chunks)
+
+        # 先逐个写入分片, 每次只编码一个分片, 队列满时在此等待
+        for chunk_id, data in chunks or []:
+            for chunk in iter_chunks(chunk_id, data, self.is_binary):
+                if self.is_closed:
+                    return
+                await self.send_bytes(self.encode(chunk))
+        await self.send_bytes(self.encode(msg))
+
+    async def send_bytes(self, data: bytes):
+        if not self.is_closed:
+            await self.queue.put(data)
+
+    async def send_text(self, data: str):
+        if not self.is_closed:
+            await self.queue.put(data)
+
+    def close(self):
+        self.is_closed = True
+        while not self.queue.empty():
+            self.queue.get_nowait()
+
+    def _is_small(self, frame: Frame) -> bool:
+        return isinstance(frame, bytes) and len(frame) <= BATCH_FRAME_SIZE
+
+    async def _write(self, frame: Frame):
+        if isinstance(frame, str):
+            await self.ws.send_text(frame)
+        else:
+            await self.ws.send_bytes(frame)
+        self.bytes_out += len(frame)
+
+    async def _write_batch(self, batch: List[bytes]):
+        if len(batch) == 1:
+            await self._write(batch[0])
+        else:
+            header = get_batch_header(self.protocol, len(batch))
+            if self.is_binary:
+                await self._write(header + b''.join(batch))
+            else:
+                await self._write(header + b','.join(batch) + b']')
+            self.batches_out += 1
+        self.frames_out += len(batch)
+
+    async def _collect(self, batch: List[bytes]) -> Optional[Frame]:
+        '''在窗口期内收集后续的小帧, 返回打断合并的帧'''
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + BATCH_WINDOW
+        size = len(batch[0])
+        while size < BATCH_MAX_SIZE:
+            if self.queue.empty():
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            else:
+                frame = self.queue.get_nowait()
+
+            if not self._is_small(frame):
+                return frame
+            batch.append(frame)  # type: ignore
+            size += len(frame)
+        return None
+
+    async def run(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                if not self.is_batch or not self._is_small(frame):
+                    await self._write(frame)
+                    self.frames_out += 1
+                    continue
+
+                batch: List[bytes] = [frame]  # type: ignore
+                pending = await self._collect(batch)
+                await self._write_batch(batch)
+                if pending is not None:
+                    await self._write(pending)
+                    self.frames_out += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f'[发送] 连接写入失败, 停止发送: {e}')
+            self.close()
@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+from msgspec import json as msgjson
+
+sys.path.append(str(Path(__file__).resolve().parents[1] / 'gsuid_core'))
+from client import GsClient  # noqa: E402
+from models import Message, MessageSend  # noqa: E402
+
+
+def test_restore_node_chunks():
+    frame = MessageSend(
+        bot_id='Nonebot',
+        target_type='direct',
+        target_id='1',
+        content=[
+            Message(type='text', data='转发'),
+            Message(
+                type='node',
+                data=[
+                    Message(type='text', data='第一条'),
+                    Message(type='image', data='chunk://a'),
+                    Message(type='file', data='x.json|chunk://b'),
+                ],
+            ),
+        ],
+    )
+    msg = msgjson.decode(msgjson.encode(frame), type=MessageSend)
+    assert msg.content and isinstance(msg.content[1].data[0], dict)
+
+    client = GsClient()
+    client.chunks = {'a': ['aGVs', 'bG8='], 'b': ['e30=']}
+    client.restore(msg.content)
+
+    node = msg.content[1].data
+    assert node[0] == Message(type='text', data='第一条')
+    assert node[1] == Message(type='image', data='base64://aGVsbG8=')
+    assert node[2] == Message(type='file', data='x.json|e30=')
+    assert client.chunks == {}
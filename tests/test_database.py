@@ -0,0 +1,108 @@
+import sys
+import asyncio
+from pathlib import Path
+
+import pytest
+from sqlmodel import SQLModel
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
+
+sys.path.append(str(Path(__file__).resolve().parents[1]))
+from gsuid_core.utils.database import base_models  # noqa: E402
+from gsuid_core.utils.database.models import GsBind  # noqa: E402
+from gsuid_core.utils.database.base_models import (  # noqa: E402
+    READ_PRAGMAS,
+    WRITE_PRAGMAS,
+    RoutingSession,
+    make_engine,
+    unit_of_work,
+    with_session,
+)
+
+TIMEOUT = 5
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    '''在临时数据库上执行, 写连接同样只有一个'''
+
+    def _run(body):
+        async def main():
+            url = f'sqlite+aiosqlite:///{tmp_path / "test.db"}'
+            write = make_engine(url, 1, WRITE_PRAGMAS, 'BEGIN IMMEDIATE')
+            read = make_engine(url, 2, READ_PRAGMAS)
+
+            class TestSession(RoutingSession):
+                write_engine = write.sync_engine
+                read_engine = read.sync_engine
+
+            monkeypatch.setattr(
+                base_models,
+                'async_maker',
+                sessionmaker(
+                    write,
+                    expire_on_commit=False,
+                    class_=AsyncSession,
+                    sync_session_class=TestSession,
+                ),
+            )
+            async with write.begin() as conn:
+                await conn.run_sync(SQLModel.metadata.create_all)
+            try:
+                return await asyncio.wait_for(body(), TIMEOUT)
+            finally:
+                await write.dispose()
+                await read.dispose()
+
+        return asyncio.run(main())
+
+    return _run
+
+
+class Probe:
+    @classmethod
+    @with_session
+    async def gather_exists(cls, session: AsyncSession, users):
+        await session.execute(GsBind.__table__.select())
+        return await asyncio.gather(
+            *(GsBind.bind_exists(user, 'b') for user in users)
+        )
+
+
+def test_gather_in_with_session(run):
+    async def body():
+        async with unit_of_work():
+            await GsBind.insert_uid('u0', 'b', '100000000', is_digit=True)
+            return await Probe.gather_exists(['u0', 'u1', 'u2'])
+
+    assert run(body) == [True, False, False]
+
+
+def test_gather_writes_after_write(run):
+    async def body():
+        async with unit_of_work():
+            await GsBind.insert_uid('u0', 'b', '100000000', is_digit=True)
+            await asyncio.gather(
+                *(
+                    GsBind.insert_uid(
+                        f'u{i}', 'b', f'10000000{i}', is_digit=True
+                    )
+                    for i in range(1, 4)
+                )
+            )
+        return [await GsBind.get_uid_by_game(f'u{i}', 'b') for i in range(4)]
+
+    assert run(body) == [f'10000000{i}' for i in range(4)]
+
+
+def test_concurrent_insert_uid(run):
+    async def body():
+        await asyncio.gather(
+            *(
+                GsBind.insert_uid('u', 'b', f'20000000{i}', is_digit=True)
+                for i in range(5)
+            )
+        )
+        return await GsBind.get_uid_list_by_game('u', 'b')
+
+    assert sorted(run(body)) == [f'20000000{i}' for i in range(5)]